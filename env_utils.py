@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 from pathlib import Path
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -9,40 +10,66 @@ except Exception:  # fallback if python-dotenv не установлен
     def load_dotenv(*args, **kwargs):  # type: ignore
         return False
 
-def load_env() -> None:
+# Флаг идемпотентности: .env читается один раз за процесс
+_LOADED = False
+
+# Строка .env вида KEY=value / KEY="value" / KEY='value'; комментарии и пустые строки не совпадают
+_ENV_RE = re.compile(r'^\s*([^#=\s][^=]*?)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|(.*?))\s*$')
+
+def load_env(force: bool = False) -> None:
     """
     Единая загрузка .env:
     1) Сначала пытаемся загрузить через python-dotenv (наиболее надежный способ)
-    2) Затем вручную парсим .env для поддержки простых многострочных значений
+    2) Если dotenv недоступен или не сработал — разбираем .env вручную
     
     Ищет .env файл в нескольких местах:
     - Текущая рабочая директория
     - Директория скрипта (где находится env_utils.py)
     - Родительские директории
+    
+    Повторные вызовы ничего не делают; force=True принудительно перечитывает .env.
     """
+    global _LOADED
+    if _LOADED and not force:
+        return
+    
     # Получаем директорию, где находится env_utils.py
     script_dir = Path(__file__).resolve().parent
     
-    # Список возможных путей к .env файлу (в порядке приоритета)
-    possible_paths = [
-        Path.cwd() / ".env",  # Текущая рабочая директория (абсолютный путь)
-        Path(".env"),  # Текущая рабочая директория (относительный)
+    # Список возможных путей к .env файлу (в порядке приоритета).
+    # Path.cwd() / ".env" и Path(".env") указывают на один файл, поэтому
+    # дубликаты отбрасываются по resolve() до обращения к файловой системе.
+    possible_paths = []
+    for candidate in (
+        Path.cwd() / ".env",  # Текущая рабочая директория
         script_dir / ".env",  # Рядом с env_utils.py
         script_dir.parent / ".env",  # Родительская директория
-    ]
+    ):
+        resolved = candidate.resolve()
+        if resolved not in possible_paths:
+            possible_paths.append(resolved)
     
-    # Сначала пробуем загрузить через python-dotenv (наиболее надежный способ)
-    loaded = False
+    # Один проход: stat() на каждый кандидат, существующие — в порядке приоритета
+    existing = []
     for env_path in possible_paths:
-        if env_path.exists():
-            try:
-                # Используем dotenv для загрузки (он правильно обрабатывает BOM и кодировки)
-                result = load_dotenv(dotenv_path=str(env_path.resolve()), override=True)
-                if result:
-                    loaded = True
-                    break
-            except Exception:
-                continue
+        try:
+            env_path.stat()
+        except OSError:
+            continue
+        existing.append(env_path)
+    found = existing[0] if existing else None
+    
+    # Сначала пробуем загрузить через python-dotenv (наиболее надежный способ);
+    # если файл не загрузился, переходим к следующему кандидату
+    loaded = False
+    for env_path in existing:
+        try:
+            # Используем dotenv для загрузки (он правильно обрабатывает BOM и кодировки)
+            if load_dotenv(dotenv_path=str(env_path), override=True):
+                loaded = True
+                break
+        except Exception:
+            continue
     
     # Если dotenv не сработал, пробуем стандартный поиск
     if not loaded:
@@ -51,21 +78,20 @@ def load_env() -> None:
         except Exception:
             pass
     
-    # Дополнительно: вручную парсим для поддержки многострочных значений
-    for env_path in possible_paths:
-        if env_path.exists():
-            try:
-                # Читаем с обработкой BOM
-                with open(env_path, "r", encoding="utf-8-sig") as f:  # utf-8-sig автоматически убирает BOM
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith("#") and "=" in line:
-                            k, v = line.split("=", 1)
-                            # Убираем кавычки и пробелы
-                            v = v.strip().strip('"').strip("'")
-                            # Устанавливаем только если еще не установлено (dotenv имеет приоритет)
-                            if k.strip() not in os.environ:
-                                os.environ[k.strip()] = v
-                break
-            except Exception:
-                continue
+    # Ручной разбор — только если python-dotenv не загрузил найденный файл
+    # (например, пакет не установлен). Ключи собираются в dict и применяются
+    # одним update без перезаписи уже установленных переменных.
+    if found is not None and not loaded:
+        try:
+            parsed = {}
+            # Читаем с обработкой BOM
+            with open(found, "r", encoding="utf-8-sig") as f:  # utf-8-sig автоматически убирает BOM
+                for line in f:
+                    m = _ENV_RE.match(line)
+                    if m:
+                        parsed[m.group(1)] = m.group(2) or m.group(3) or m.group(4) or ""
+            os.environ.update({k: v for k, v in parsed.items() if k not in os.environ})
+        except Exception:
+            pass
+    
+    _LOADED = True
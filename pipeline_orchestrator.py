@@ -6,68 +6,134 @@ Coordinates the pipeline: YouTube Subtitles -> SAG v2.0 Final Data
 """
 
 import argparse
-import json
+import atexit
+import copy
+import functools
+import gzip
 import logging
 import os
+import queue
 import sys
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
+import orjson
 import yaml
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML собран без libyaml
+    from yaml import SafeLoader as _YamlLoader
 
 from env_utils import load_env
 from subtitle_extractor.get_subtitles import YouTubeSubtitlesExtractor
 from text_processor.sarsekenov_processor import SarsekenovProcessor
 from text_processor.sd_labeler import SDLabeler
-from vector_db import VectorDBManager, EmbeddingService, VectorIndexer
 from utils.video_registry import VideoRegistry, VideoMetadata, ProcessingRecord
 from utils.youtube_metadata_fetcher import YouTubeAPIMetadataFetcher
-from utils.file_utils import create_filename, get_date_paths
+from utils.file_utils import create_filename, get_date_paths, ensure_dir
 from utils.channel_list_parser import ChannelListParser
 from utils.markdown_updater import MarkdownUpdater
 from datetime import datetime
 
+# Кэш разобранных конфигов: abspath -> (st_mtime_ns, config)
+_CONFIG_CACHE: Dict[str, tuple] = {}
+
+
+def _load_config(config_path: str) -> Dict[str, Any]:
+    """Загрузка YAML конфига с кэшем по пути и времени модификации файла"""
+    path = os.path.abspath(config_path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _CONFIG_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+    _CONFIG_CACHE[path] = (mtime, config)
+    return config
+
+
+def _dumps_result(obj: Any) -> bytes:
+    """Сериализация результатов пайплайна (orjson, UTF-8 без экранирования)"""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_subtitle_extractor(output_dir: str) -> YouTubeSubtitlesExtractor:
+    """Один экстрактор субтитров на output_dir в пределах процесса"""
+    return YouTubeSubtitlesExtractor(output_dir=output_dir)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_text_processor() -> SarsekenovProcessor:
+    """Один SarsekenovProcessor на процесс: tiktoken, OpenAI клиент и экстракторы создаются однократно"""
+    return SarsekenovProcessor()
+
+
+@functools.lru_cache(maxsize=4)
+def _get_channel_parser(json_path: str, mtime_ns: int) -> ChannelListParser:
+    """Разобранный список канала; mtime_ns в ключе кэша — изменение файла дает новый парсер"""
+    return ChannelListParser(json_path)
+
+
 class PipelineOrchestrator:
-    def __init__(self, config_path: str, domain: str = "sarsekenov"):
-        """Initialize the pipeline orchestrator for SAG v2.0"""
+    def __init__(self, config_path: str, domain: str = "sarsekenov",
+                 enable_vector_db: Optional[bool] = None):
+        """
+        Initialize the pipeline orchestrator for SAG v2.0
+        
+        Args:
+            enable_vector_db: Переопределяет vector_db.auto_index из config (None — как в config)
+        """
         # 1) env
         load_env()
         # 2) config
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        # Копия: экземпляр может менять config (например, auto_index), не трогая кэш
+        self.config = copy.deepcopy(_load_config(config_path))
+        if enable_vector_db is not None and self.config.get('vector_db'):
+            self.config['vector_db']['auto_index'] = enable_vector_db
         # 3) logging
         self._setup_logging()
         self.logger = logging.getLogger("pipeline")
         self._setup_dirs()
+        self._resolve_settings()
         
         # 3.5) Video Registry и Metadata Fetcher
         registry_path = self.config.get('pipeline', {}).get('registry_path', 'data/video_registry.json')
         self.registry = VideoRegistry(registry_path)
         self.metadata_fetcher = YouTubeAPIMetadataFetcher()
+        # Метаданные, заранее полученные пакетным запросом в run_batch_pipeline
+        self._metadata_cache: Dict[str, Dict[str, Any]] = {}
         
-        # 3.6) Markdown Updater для обновления списка видео
-        channel_list_config = self.config.get('channel_list', {})
-        markdown_path = Path(__file__).resolve().parent / "data" / "channel_video_list" / "channel_videos_list.md"
-        if markdown_path.exists():
-            try:
-                self.markdown_updater = MarkdownUpdater(str(markdown_path), registry_path)
-            except:
-                self.markdown_updater = None
-        else:
-            self.markdown_updater = None
+        # 3.6) Markdown Updater для обновления списка видео — создается лениво,
+        # только когда batch-режим впервые обновляет список (см. _get_markdown_updater)
+        self._markdown_updater: Optional[MarkdownUpdater] = None
+        self._markdown_updater_args: Optional[tuple] = (
+            Path(__file__).resolve().parent / "data" / "channel_video_list" / "channel_videos_list.md",
+            registry_path,
+        )
         
         # 4) stages - только SAG v2.0
-        self.subtitle_extractor = YouTubeSubtitlesExtractor(
-            output_dir=self.config['pipeline']['subtitles']['output_dir']
+        self.subtitle_extractor = _get_subtitle_extractor(
+            self.config['pipeline']['subtitles']['output_dir']
         )
         # Только SarsekenovProcessor для SAG v2.0
-        self.text_processor = SarsekenovProcessor()
+        self.text_processor = _get_text_processor()
+        # SD-разметка: создается лениво при первом видео (см. _get_sd_labeler)
+        self._sd_labeler: Optional[SDLabeler] = None
+        self._sd_labeler_lock = threading.Lock()
         
         # 5) Vector DB (опционально, если настроено)
         self.vector_indexer = None
+        self._warmup_thread: Optional[threading.Thread] = None
         if self.config.get('vector_db', {}).get('auto_index', False):
             try:
+                # Ленивый импорт: chromadb и sentence-transformers (torch) нужны только при индексации
+                from vector_db import VectorDBManager, EmbeddingService, CachedEmbeddingService, VectorIndexer
                 db_manager = VectorDBManager(
                     db_path=self.config['vector_db']['db_path'],
                     collection_prefix=self.config['vector_db']['collection_prefix']
@@ -75,89 +141,164 @@ class PipelineOrchestrator:
                 
                 # Модель: сначала из env, потом из config
                 embedding_model = os.getenv("SENTENCE_TRANSFORMERS_MODEL") or self.config['vector_db']['embedding'].get('model')
-                embedding_service = EmbeddingService(model=embedding_model)
+                embedding_service = EmbeddingService(
+                    model=embedding_model,
+                    backend=os.getenv("SENTENCE_TRANSFORMERS_BACKEND") or self.config['vector_db']['embedding'].get('backend')
+                )
+                # Прогрев в фоне: Stage 1–2 упираются в сеть, модель успевает прогреться к Stage 4
+                self._warmup_thread = threading.Thread(
+                    target=embedding_service.warmup, name="embedding-warmup", daemon=True
+                )
+                self._warmup_thread.start()
+                if self.config['vector_db'].get('embedding_cache', True):
+                    embedding_service = CachedEmbeddingService(
+                        embedding_service,
+                        cache_path=self.config['vector_db'].get('cache_path', '.cache/embeddings.sqlite')
+                    )
                 self.vector_indexer = VectorIndexer(
                     db_manager=db_manager,
                     embedding_service=embedding_service,
-                    batch_size=self.config['vector_db'].get('batch_size', 100)
+                    batch_size=self.config['vector_db'].get('batch_size', 100),
+                    embedding_batch_size=self.config['vector_db']['embedding'].get('batch_size', 64)
                 )
                 self.logger.info("✅ Vector DB индексация активирована")
             except Exception as e:
-                self.logger.warning(f"⚠️ Не удалось инициализировать Vector DB: {e}")
+                self.logger.warning("⚠️ Не удалось инициализировать Vector DB: %s", e)
                 self.vector_indexer = None
     
     def _setup_logging(self) -> None:
         log_cfg = self.config['logging']
         Path(Path(log_cfg['log_file']).parent).mkdir(parents=True, exist_ok=True)
-        logging.basicConfig(
-            level=getattr(logging, log_cfg['level'], logging.INFO),
-            format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-            handlers=[
-                logging.FileHandler(log_cfg['log_file'], encoding='utf-8'),
-                logging.StreamHandler()
-            ],
+        root = logging.getLogger()
+        # Как и basicConfig: если логирование уже настроено, ничего не трогаем
+        if root.handlers:
+            return
+        
+        # Один Formatter на все обработчики; явный datefmt без миллисекунд —
+        # asctime формируется одним strftime без дополнительного %-форматирования msecs
+        formatter = logging.Formatter(
+            "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
         )
+        file_handler = logging.FileHandler(log_cfg['log_file'], encoding='utf-8')
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+        
+        # Запись в файл/консоль идет в фоновом потоке: вызов logger.* — лишь постановка в очередь
+        log_queue = queue.Queue(-1)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(getattr(logging, log_cfg['level'], logging.INFO))
+        self._log_listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        self._log_listener.start()
+        # Дописываем оставшиеся записи при завершении процесса
+        atexit.register(self._log_listener.stop)
 
     def _setup_dirs(self) -> None:
-        for d in [
-            self.config['pipeline']['subtitles']['output_dir'],
-            self.config['pipeline']['text_processing']['output_dir'],
-        ]:
-            Path(d).mkdir(parents=True, exist_ok=True)
+        # Пути строятся один раз и переиспользуются на каждом видео
+        self._subtitles_dir = Path(self.config['pipeline']['subtitles']['output_dir'])
+        self._text_out_dir = Path(self.config['pipeline']['text_processing']['output_dir'])
+        for d in [self._subtitles_dir, self._text_out_dir]:
+            d.mkdir(parents=True, exist_ok=True)
 
-    def _apply_sd_labeling(self, sag_json_path: Path) -> None:
-        """Дополнить SAG JSON SD-метаданными блоков (best effort, без падения pipeline)."""
+    def _resolve_settings(self) -> None:
+        """Настройки, читаемые на каждом видео, разрешаются один раз при инициализации"""
         sd_cfg = self.config.get("sd_labeling", {})
-        if not sd_cfg.get("enabled", True):
+        self._sd_enabled = bool(sd_cfg.get("enabled", True))
+        self._sd_author_id = (
+            sd_cfg.get("author_id")
+            or self.config.get("author", {}).get("author_id")
+            or "unknown"
+        )
+        self._index_levels = self.config.get('vector_db', {}).get(
+            'index_levels', ['documents', 'blocks', 'graph_entities']
+        )
+
+    def _get_markdown_updater(self) -> Optional[MarkdownUpdater]:
+        """MarkdownUpdater при первом обращении; None, если файла списка нет или создание не удалось"""
+        if self._markdown_updater is None and self._markdown_updater_args is not None:
+            markdown_path, registry_path = self._markdown_updater_args
+            # Повторных попыток не делаем — и при успехе, и при ошибке
+            self._markdown_updater_args = None
+            if markdown_path.exists():
+                try:
+                    self._markdown_updater = MarkdownUpdater(str(markdown_path), registry_path, registry=self.registry)
+                except Exception as e:
+                    self.logger.warning("[WARNING] Не удалось инициализировать MarkdownUpdater: %s", e)
+        return self._markdown_updater
+    
+    def _get_sd_labeler(self) -> SDLabeler:
+        """SDLabeler создается один раз и переиспользуется для всех видео (OpenAI клиент потокобезопасен)"""
+        with self._sd_labeler_lock:
+            if self._sd_labeler is None:
+                sd_cfg = self.config.get("sd_labeling", {})
+                self._sd_labeler = SDLabeler(
+                    model=sd_cfg.get("model", "gpt-4o-mini"),
+                    temperature=float(sd_cfg.get("temperature", 0.1)),
+                    max_tokens=int(sd_cfg.get("max_tokens", 200)),
+                    max_chars=int(sd_cfg.get("max_chars", 1500)),
+                )
+            return self._sd_labeler
+
+    def _apply_sd_labeling(self, sag_json_path: Path) -> Optional[Dict[str, Any]]:
+        """Дополнить SAG JSON SD-метаданными блоков (best effort, без падения pipeline).
+        
+        Возвращает разобранный SAG JSON (чтобы не перечитывать файл), либо None,
+        если файл не читался (разметка отключена или ошибка чтения).
+        """
+        if not self._sd_enabled:
             self.logger.info("[PIPELINE] SD labeling disabled by config")
-            return
+            return None
 
+        sag_data = None
         try:
-            with open(sag_json_path, "r", encoding="utf-8") as f:
-                sag_data = json.load(f)
+            with open(sag_json_path, "rb") as f:
+                sag_data = orjson.loads(f.read())
 
             blocks = sag_data.get("blocks", [])
             if not blocks:
                 self.logger.warning("[PIPELINE] SD labeling skipped: no blocks in SAG JSON")
-                return
+                return sag_data
 
-            labeler = SDLabeler(
-                model=sd_cfg.get("model", "gpt-4o-mini"),
-                temperature=float(sd_cfg.get("temperature", 0.1)),
-                max_tokens=int(sd_cfg.get("max_tokens", 200)),
-                max_chars=int(sd_cfg.get("max_chars", 1500)),
-            )
-            author_id = (
-                sd_cfg.get("author_id")
-                or self.config.get("author", {}).get("author_id")
-                or "unknown"
-            )
-            sag_data["blocks"] = labeler.label_blocks_batch(blocks, author_id=author_id)
+            labeler = self._get_sd_labeler()
+            sag_data["blocks"] = labeler.label_blocks_batch(blocks, author_id=self._sd_author_id)
 
-            with open(sag_json_path, "w", encoding="utf-8") as f:
-                json.dump(sag_data, f, ensure_ascii=False, indent=2)
+            with open(sag_json_path, "wb") as f:
+                f.write(orjson.dumps(sag_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
             self.logger.info(
-                f"[PIPELINE] SD labeling complete: {len(sag_data['blocks'])} blocks labeled"
+                "[PIPELINE] SD labeling complete: %s blocks labeled", len(sag_data['blocks'])
             )
         except Exception as exc:
             self.logger.warning(
-                f"[PIPELINE] SD labeling failed: {exc}. Continue without SD metadata."
+                "[PIPELINE] SD labeling failed: %s. Continue without SD metadata.", exc
             )
+        return sag_data
+    
+    def _rename_output(self, old_path: Path, new_name: str, output_dir: Path) -> str:
+        """Переименование выходного файла (os.replace атомарен и не требует проверки exists)"""
+        new_path = output_dir / new_name
+        try:
+            os.replace(old_path, new_path)
+        except OSError as e:
+            self.logger.warning("⚠️ Не удалось переименовать файл %s: %s", old_path.name, e)
+            return str(old_path)
+        return str(new_path)
     
     def run_full_pipeline(self, youtube_url: str, custom_name: str = None) -> Dict[str, Any]:
         """Run the complete SAG v2.0 pipeline for a single YouTube URL"""
-        pipeline_start = time.time()
+        # Длительности — по perf_counter: монотонный счетчик с наибольшим разрешением
+        pipeline_start = time.perf_counter()
         results = {
             "youtube_url": youtube_url,
             "custom_name": custom_name,
-            "pipeline_start": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "pipeline_start": datetime.now().isoformat(sep=" ", timespec="seconds"),
             "schema_version": "2.0",
             "processing_version": "v2.1",
             "stages": {}
         }
         
-        self.logger.info(f"🚀 Starting SAG v2.0 pipeline for: {youtube_url}")
+        self.logger.info("🚀 Starting SAG v2.0 pipeline for: %s", youtube_url)
         
         video_id = None
         video_metadata = None
@@ -171,7 +312,7 @@ class PipelineOrchestrator:
             
             # Проверка дубликатов
             if self.registry.is_processed(video_id):
-                self.logger.info(f"⏭️  Пропуск {video_id}: уже обработано")
+                self.logger.info("⏭️  Пропуск %s: уже обработано", video_id)
                 return {
                     "status": "skipped",
                     "reason": "already_processed",
@@ -180,22 +321,20 @@ class PipelineOrchestrator:
                 }
             
             # Получение метаданных через YouTube API
-            self.logger.info(f"📥 Получение метаданных для {video_id}...")
+            self.logger.info("📥 Получение метаданных для %s...", video_id)
             try:
-                metadata_dict = self.metadata_fetcher.fetch_metadata(youtube_url)
+                metadata_dict = self._metadata_cache.pop(video_id, None) or self.metadata_fetcher.fetch_metadata(youtube_url)
                 video_metadata = VideoMetadata(**metadata_dict)
                 
                 # Добавляем в реестр, если еще нет
                 if not self.registry.video_exists(video_id):
                     self.registry.add_video(video_metadata)
                 else:
-                    # Обновляем метаданные если они изменились
-                    video_metadata = VideoMetadata(**metadata_dict)
                     self.registry.update_status(video_id, "pending")
                 
-                self.logger.info(f"✅ Метаданные получены: {video_metadata.title}")
+                self.logger.info("✅ Метаданные получены: %s", video_metadata.title)
             except Exception as e:
-                self.logger.warning(f"⚠️ Ошибка получения метаданных: {e}. Используем базовые значения.")
+                self.logger.warning("⚠️ Ошибка получения метаданных: %s. Используем базовые значения.", e)
                 # Создаем базовые метаданные
                 video_metadata = VideoMetadata(
                     video_id=video_id,
@@ -213,7 +352,7 @@ class PipelineOrchestrator:
             
             # Stage 1: Get Subtitles
             self.logger.info("📥 Stage 1: Downloading subtitles from YouTube")
-            stage1_start = time.time()
+            stage1_start = time.perf_counter()
             
             subtitles = self.subtitle_extractor.get_subtitles(video_id)
             if not subtitles:
@@ -232,12 +371,12 @@ class PipelineOrchestrator:
 
             results["stages"]["subtitles"] = {
                 "status": "success",
-                "duration": time.time() - stage1_start,
+                "duration": time.perf_counter() - stage1_start,
                 "json_path": saved_files["json"],
                 "srt_path": saved_files["srt"],
                 "txt_path": saved_files["txt"]
             }
-            self.logger.info(f"Stage 1 complete: {saved_files['json']}")
+            self.logger.info("Stage 1 complete: %s", saved_files['json'])
             
             # Сохраняем путь к файлу субтитров в реестре
             if video_metadata:
@@ -245,17 +384,16 @@ class PipelineOrchestrator:
             
             # Stage 2: Text Processing (SAG v2.0)
             self.logger.info("📝 Stage 2: Processing text for SAG v2.0")
-            stage2_start = time.time()
+            stage2_start = time.perf_counter()
             
             transcript_path = Path(saved_files["json"])
             
             # Определяем output_dir с учетом дат (если есть метаданные)
             if video_metadata:
-                base_output_dir = Path(self.config['pipeline']['text_processing']['output_dir'])
-                output_dir, year, month = get_date_paths(base_output_dir, video_metadata.published_date)
-                output_dir.mkdir(parents=True, exist_ok=True)
+                output_dir, year, month = get_date_paths(self._text_out_dir, video_metadata.published_date)
+                ensure_dir(output_dir)
             else:
-                output_dir = Path(self.config['pipeline']['text_processing']['output_dir'])
+                output_dir = self._text_out_dir
             
             # Прямая обработка в SAG v2.0
             text_result = self.text_processor.process_subtitles_file(
@@ -264,47 +402,41 @@ class PipelineOrchestrator:
             
             # Если есть метаданные, переименовываем файлы с датами и названиями
             if video_metadata:
-                try:
-                    # Переименовываем SAG JSON файл
-                    old_json_path = Path(text_result["json_output"])
-                    new_json_filename = create_filename(
-                        video_id, 
-                        video_metadata.title, 
-                        video_metadata.published_date, 
+                # Переименовываем SAG JSON файл
+                text_result["json_output"] = self._rename_output(
+                    Path(text_result["json_output"]),
+                    create_filename(
+                        video_id,
+                        video_metadata.title,
+                        video_metadata.published_date,
                         ext="for_vector.json"
-                    )
-                    new_json_path = output_dir / new_json_filename
-                    if old_json_path.exists() and old_json_path != new_json_path:
-                        old_json_path.rename(new_json_path)
-                        text_result["json_output"] = str(new_json_path)
-                    
-                    # Переименовываем MD файл
-                    old_md_path = Path(text_result["md_output"])
-                    new_md_filename = create_filename(
+                    ),
+                    output_dir
+                )
+                # Переименовываем MD файл
+                text_result["md_output"] = self._rename_output(
+                    Path(text_result["md_output"]),
+                    create_filename(
                         video_id,
                         video_metadata.title,
                         video_metadata.published_date,
                         ext="for_review.md"
-                    )
-                    new_md_path = output_dir / new_md_filename
-                    if old_md_path.exists() and old_md_path != new_md_path:
-                        old_md_path.rename(new_md_path)
-                        text_result["md_output"] = str(new_md_path)
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Не удалось переименовать файлы: {e}")
+                    ),
+                    output_dir
+                )
 
             # SD-разметка блоков после формирования SAG JSON
-            self._apply_sd_labeling(Path(text_result["json_output"]))
+            sag_data = self._apply_sd_labeling(Path(text_result["json_output"]))
             
             results["stages"]["text_processing"] = {
                 "status": "success", 
-                "duration": time.time() - stage2_start,
+                "duration": time.perf_counter() - stage2_start,
                 "sag_v2_output": text_result["json_output"],
                 "review_markdown": text_result["md_output"],
                 "blocks_created": text_result["blocks_created"],
                 "schema_version": "2.0"
             }
-            self.logger.info(f"✅ Stage 2 complete: {text_result['blocks_created']} SAG v2.0 blocks created")
+            self.logger.info("✅ Stage 2 complete: %s SAG v2.0 blocks created", text_result['blocks_created'])
             
             # Stage 3: Pipeline завершен
             self.logger.info("✅ Stage 3: Pipeline complete")
@@ -314,18 +446,21 @@ class PipelineOrchestrator:
             }
             
             # Pipeline Summary
-            total_duration = time.time() - pipeline_start
+            total_duration = time.perf_counter() - pipeline_start
             
             # Подсчитываем количество сущностей из SAG результата
             entities_count = 0
             blocks_count = text_result.get("blocks_created", 0)
             try:
-                with open(text_result["json_output"], 'r', encoding='utf-8') as f:
-                    sag_data = json.load(f)
-                    for block in sag_data.get("blocks", []):
-                        entities_count += len(block.get("graph_entities", []))
-            except:
-                pass
+                # SAG JSON уже разобран при SD-разметке; читаем файл только если разметка не выполнялась
+                if sag_data is None:
+                    with open(text_result["json_output"], 'rb') as f:
+                        sag_data = orjson.loads(f.read())
+                # sum/map/len целиком на C. Numba здесь не подходит: обход dict/list
+                # уходит в object mode и работает медленнее обычного Python
+                entities_count = sum(map(len, (block.get("graph_entities", ()) for block in sag_data.get("blocks", []))))
+            except Exception as e:
+                self.logger.debug("Не удалось подсчитать граф-сущности: %s", e)
             
             # Оценка стоимости API (упрощенная)
             api_cost_estimate = blocks_count * 0.01  # Примерная оценка
@@ -335,9 +470,12 @@ class PipelineOrchestrator:
                 self.registry.set_file_path(video_id, "sag_json", text_result["json_output"])
                 self.registry.set_file_path(video_id, "sag_md", text_result["md_output"])
             
+            # Одна отметка времени на запись в реестре и поле pipeline_end
+            finished_at = datetime.now()
+            
             # Создаем запись об обработке
             processing_record = ProcessingRecord(
-                processed_at=datetime.now().isoformat(),
+                processed_at=finished_at.isoformat(),
                 pipeline_version="v2.1",
                 stage_completed="all",
                 blocks_created=blocks_count,
@@ -351,7 +489,7 @@ class PipelineOrchestrator:
                 "status": "success",
                 "video_id": video_id,
                 "total_duration": total_duration,
-                "pipeline_end": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "pipeline_end": finished_at.isoformat(sep=" ", timespec="seconds"),
                 "final_outputs": {
                     "sag_v2_json": text_result["json_output"],
                     "review_markdown": text_result["md_output"]
@@ -360,41 +498,53 @@ class PipelineOrchestrator:
                 "entities_extracted": entities_count
             })
             
-            self.logger.info(f"🎯 SAG v2.0 Pipeline complete! Total time: {total_duration:.1f}s")
-            self.logger.info(f"📁 SAG v2.0 JSON: {text_result['json_output']}")
-            self.logger.info(f"📖 Review Markdown: {text_result['md_output']}")
+            self.logger.info("🎯 SAG v2.0 Pipeline complete! Total time: %.1fs", total_duration)
+            self.logger.info("📁 SAG v2.0 JSON: %s", text_result['json_output'])
+            self.logger.info("📖 Review Markdown: %s", text_result['md_output'])
             
             # Stage 4: Vector DB Indexing (опционально)
             if self.vector_indexer:
                 self.logger.info("🔍 Stage 4: Indexing to Vector DB")
-                stage4_start = time.time()
+                stage4_start = time.perf_counter()
+                if self._warmup_thread is not None:
+                    self._warmup_thread.join()
                 try:
-                    index_levels = self.config['vector_db'].get('index_levels', ['documents', 'blocks', 'graph_entities'])
-                    index_result = self.vector_indexer.index_sag_file(
-                        Path(text_result['json_output']),
-                        index_levels=index_levels
-                    )
+                    # SAG JSON уже разобран выше — индексируем словарь, не перечитывая файл
+                    if sag_data is not None:
+                        index_result = self.vector_indexer.index_sag_dict(
+                            sag_data,
+                            index_levels=self._index_levels,
+                            source=Path(text_result['json_output']).name
+                        )
+                    else:
+                        index_result = self.vector_indexer.index_sag_file(
+                            Path(text_result['json_output']),
+                            index_levels=self._index_levels
+                        )
                     results["stages"]["vector_indexing"] = {
                         "status": "success" if index_result["success"] else "failed",
-                        "duration": time.time() - stage4_start,
+                        "duration": time.perf_counter() - stage4_start,
                         "indexed": index_result["indexed"]
                     }
                     if index_result["success"]:
-                        self.logger.info(f"✅ Vector DB индексация завершена: {index_result['indexed']}")
+                        self.logger.info("✅ Vector DB индексация завершена: %s", index_result['indexed'])
                     else:
-                        self.logger.warning(f"⚠️ Vector DB индексация завершена с ошибками")
+                        self.logger.warning("⚠️ Vector DB индексация завершена с ошибками")
+                    cache_stats = getattr(self.vector_indexer.embedding_service, "stats", None)
+                    if cache_stats:
+                        self.logger.info("🗃️ Кэш эмбеддингов: %s", cache_stats())
                 except Exception as e:
-                    self.logger.error(f"Ошибка при индексации в Vector DB: {e}", exc_info=True)
+                    self.logger.error("Ошибка при индексации в Vector DB: %s", e, exc_info=True)
                     results["stages"]["vector_indexing"] = {
                         "status": "failed",
-                        "duration": time.time() - stage4_start,
+                        "duration": time.perf_counter() - stage4_start,
                         "error": str(e)
                     }
             
             return results
             
         except Exception as e:
-            self.logger.error(f"Pipeline failed: {e}", exc_info=True)
+            self.logger.error("Pipeline failed: %s", e, exc_info=True)
             
             # Записываем ошибку в реестр
             if video_id:
@@ -405,7 +555,7 @@ class PipelineOrchestrator:
                         stage_completed="failed",
                         blocks_created=0,
                         entities_extracted=0,
-                        processing_time_seconds=time.time() - pipeline_start,
+                        processing_time_seconds=time.perf_counter() - pipeline_start,
                         api_cost_estimate=0.0,
                         error_message=str(e)
                     )
@@ -417,12 +567,22 @@ class PipelineOrchestrator:
                 "status": "failed",
                 "error": str(e),
                 "video_id": video_id,
-                "total_duration": time.time() - pipeline_start
+                "total_duration": time.perf_counter() - pipeline_start
             })
             return results
     
-    def run_batch_pipeline(self, urls_file: str) -> List[Dict[str, Any]]:
-        """Run pipeline for multiple URLs from file with support for video numbers from channel list"""
+    @staticmethod
+    def _read_urls_file(urls_file: str) -> List[str]:
+        """Чтение URL из файла: пустые строки и комментарии пропускаются"""
+        with open(urls_file, 'r', encoding='utf-8') as f:
+            return [u for u in (line.strip() for line in f) if u and not u.startswith('#')]
+    
+    def run_batch_pipeline(self, urls_file: str, progress_file: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run pipeline for multiple URLs from file with support for video numbers from channel list
+        
+        Если указан progress_file, каждый завершенный результат дописывается туда
+        строкой JSON Lines — прогресс не теряется при падении посреди batch.
+        """
         # Проверяем настройки использования списка канала
         channel_list_config = self.config.get('channel_list', {})
         use_channel_list = channel_list_config.get('use_channel_list', True)
@@ -436,87 +596,150 @@ class PipelineOrchestrator:
             json_path_full = Path(__file__).resolve().parent / json_path
             if json_path_full.exists():
                 try:
-                    parser = ChannelListParser(str(json_path_full))
+                    parser = _get_channel_parser(str(json_path_full), json_path_full.stat().st_mtime_ns)
                     urls, warnings = parser.parse_urls_file(urls_file)
                     
                     # Выводим предупреждения если есть
                     for warning in warnings:
-                        self.logger.warning(f"[WARNING] {warning}")
+                        self.logger.warning("[WARNING] %s", warning)
                     
-                    self.logger.info(f"[INFO] Использован список канала: найдено {len(urls)} URL из файла {urls_file}")
+                    self.logger.info("[INFO] Использован список канала: найдено %s URL из файла %s", len(urls), urls_file)
                 except Exception as e:
-                    self.logger.warning(f"[WARNING] Ошибка при использовании списка канала: {e}. Используется обычный режим.")
+                    self.logger.warning("[WARNING] Ошибка при использовании списка канала: %s. Используется обычный режим.", e)
                     # Fallback на обычный режим
-                    with open(urls_file, 'r', encoding='utf-8') as f:
-                        urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                    urls = self._read_urls_file(urls_file)
             else:
-                self.logger.warning(f"[WARNING] Файл списка канала не найден: {json_path_full}. Используется обычный режим.")
+                self.logger.warning("[WARNING] Файл списка канала не найден: %s. Используется обычный режим.", json_path_full)
                 # Fallback на обычный режим
-                with open(urls_file, 'r', encoding='utf-8') as f:
-                    urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                urls = self._read_urls_file(urls_file)
         else:
             # Обычный режим без использования списка
-            with open(urls_file, 'r', encoding='utf-8') as f:
-                urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+            urls = self._read_urls_file(urls_file)
         
-        self.logger.info(f"🚀 Starting SAG v2.0 batch pipeline for {len(urls)} URLs")
+        # Дубликаты URL отбрасываем в один проход, сохраняя порядок
+        unique_urls = list(dict.fromkeys(urls))
+        duplicates = len(urls) - len(unique_urls)
+        urls = unique_urls
+        
+        self.logger.info("🚀 Starting SAG v2.0 batch pipeline for %s URLs (дубликатов пропущено: %s)", len(urls), duplicates)
         
         # Шаг 1: Сбор метаданных и проверка дубликатов
         videos_to_process = []
-        skipped_count = 0
+        duplicate_ids = 0
+        already_done = 0
+        seen_ids = set()
+        # Один снимок вместо обращения к реестру на каждый URL
+        processed_ids = self.registry.get_processed_ids()
         
         for url in urls:
             try:
                 video_id = self.subtitle_extractor.extract_video_id(url)
                 if not video_id:
-                    self.logger.warning(f"⚠️ Не удалось извлечь video_id из: {url}")
+                    self.logger.warning("⚠️ Не удалось извлечь video_id из: %s", url)
+                    continue
+                
+                # Разные формы URL (youtu.be, watch?v=) могут указывать на одно видео
+                if video_id in seen_ids:
+                    self.logger.info("⏭️  Пропуск %s: дубликат в списке", video_id)
+                    duplicate_ids += 1
                     continue
+                seen_ids.add(video_id)
                 
                 # Проверка: уже обработано?
-                if self.registry.is_processed(video_id):
-                    self.logger.info(f"⏭️  Пропуск {video_id}: уже обработано")
-                    skipped_count += 1
+                if video_id in processed_ids:
+                    self.logger.info("⏭️  Пропуск %s: уже обработано", video_id)
+                    already_done += 1
                     continue
                 
                 videos_to_process.append((video_id, url))
                 
             except Exception as e:
-                self.logger.error(f"❌ Ошибка обработки URL {url}: {e}")
+                self.logger.error("❌ Ошибка обработки URL %s: %s", url, e)
                 continue
         
-        self.logger.info(f"✅ К обработке: {len(videos_to_process)} видео (пропущено: {skipped_count})")
+        self.logger.info(
+            "✅ К обработке: %s видео (всего URL: %s, дубликатов: %s, уже обработано: %s)",
+            len(videos_to_process), len(urls) + duplicates, duplicates + duplicate_ids, already_done
+        )
         
-        # Шаг 2: Обработка видео
-        results = []
-        for i, (video_id, url) in enumerate(videos_to_process, 1):
-            self.logger.info(f"\n{'='*60}")
-            self.logger.info(f"📹 Обработка видео {i}/{len(videos_to_process)}: {video_id}")
-            self.logger.info(f"{'='*60}\n")
-            
-            result = self.run_full_pipeline(url)
-            results.append(result)
-            
-            # Обновляем Markdown файл после обработки
-            if self.markdown_updater and result.get("status") == "success":
-                try:
-                    self.markdown_updater.update_after_processing(video_id)
-                    self.logger.info(f"[INFO] Markdown файл обновлен для видео {video_id}")
-                except Exception as e:
-                    self.logger.warning(f"[WARNING] Не удалось обновить Markdown для {video_id}: {e}")
+        # Метаданные всех видео одним проходом: ⌈N/50⌉ запросов вместо N
+        prefetched = self.metadata_fetcher.fetch_metadata_batch([video_id for video_id, _ in videos_to_process])
+        self._metadata_cache.update(prefetched)
+        if prefetched:
+            self.logger.info("📥 Метаданные получены пакетно: %s/%s", len(prefetched), len(videos_to_process))
+        
+        # Шаг 2: Обработка видео (параллельно, ограниченный пул потоков).
+        # Этапы упираются в сеть (YouTube, OpenAI), поэтому используются потоки:
+        # клиенты и реестр разделяются, а не сериализуются между процессами.
+        concurrency = max(1, int(self.config.get('pipeline', {}).get('batch_concurrency', 1)))
+        total = len(videos_to_process)
+        self.logger.info("⚙️ Параллельная обработка: до %s видео одновременно", concurrency)
+        
+        # Порядок запуска: длинные видео первыми. Результаты остаются в порядке входного списка
+        submit_order = list(enumerate(videos_to_process))
+        if self.config.get('pipeline', {}).get('sort_by_duration', True) and prefetched:
+            submit_order.sort(
+                key=lambda item: prefetched.get(item[1][0], {}).get('duration_seconds') or 0,
+                reverse=True
+            )
+        
+        results: List[Dict[str, Any]] = [None] * total
+        progress = None
+        if progress_file:
+            Path(progress_file).parent.mkdir(parents=True, exist_ok=True)
+            progress = open(progress_file, "ab")
+        # Реестр пишется на диск раз в flush_every видео, а не на каждое изменение статуса
+        flush_every = max(1, int(self.config.get('pipeline', {}).get('registry_flush_every', 10)))
+        try:
+            with self.registry.batch(), ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = {
+                    executor.submit(self.run_full_pipeline, url): (i, video_id, url)
+                    for i, (video_id, url) in submit_order
+                }
+                done = 0
+                for future in as_completed(futures):
+                    i, video_id, url = futures[future]
+                    done += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error("❌ Ошибка обработки %s: %s", video_id, e)
+                        result = {"status": "failed", "url": url, "video_id": video_id, "error": str(e)}
+                    results[i] = result
+                    self.logger.info("📹 Завершено %s/%s: %s (%s)", done, total, video_id, result.get('status'))
+                    if done % flush_every == 0:
+                        self.registry.flush()
+                    
+                    # Дописываем одну строку вместо перезаписи всего списка
+                    if progress:
+                        progress.write(orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE, default=str))
+                        progress.flush()
+                    
+                    # Обновляем Markdown файл после обработки
+                    markdown_updater = self._get_markdown_updater() if result.get("status") == "success" else None
+                    if markdown_updater:
+                        try:
+                            markdown_updater.update_after_processing(video_id)
+                            self.logger.info("[INFO] Markdown файл обновлен для видео %s", video_id)
+                        except Exception as e:
+                            self.logger.warning("[WARNING] Не удалось обновить Markdown для %s: %s", video_id, e)
+        finally:
+            if progress:
+                progress.close()
         
         # Финальная статистика
         stats = self.registry.get_statistics()
-        self.logger.info(f"\n{'='*60}")
-        self.logger.info(f"📊 ИТОГОВАЯ СТАТИСТИКА")
-        self.logger.info(f"{'='*60}")
-        self.logger.info(f"Всего видео: {stats['total_videos']}")
-        self.logger.info(f"Обработано: {stats['processed']}")
-        self.logger.info(f"Ошибок: {stats['failed']}")
-        self.logger.info(f"В очереди: {stats['pending']}")
-        self.logger.info(f"Всего блоков: {stats['total_blocks']}")
-        self.logger.info(f"Всего сущностей: {stats['total_entities']}")
-        self.logger.info(f"Затраты API: ${stats['total_api_cost']}")
-        self.logger.info(f"{'='*60}\n")
+        self.logger.info("\n%s", '='*60)
+        self.logger.info("📊 ИТОГОВАЯ СТАТИСТИКА")
+        self.logger.info("%s", '='*60)
+        self.logger.info("Всего видео: %s", stats['total_videos'])
+        self.logger.info("Обработано: %s", stats['processed'])
+        self.logger.info("Ошибок: %s", stats['failed'])
+        self.logger.info("В очереди: %s", stats['pending'])
+        self.logger.info("Всего блоков: %s", stats['total_blocks'])
+        self.logger.info("Всего сущностей: %s", stats['total_entities'])
+        self.logger.info("Затраты API: $%s", stats['total_api_cost'])
+        self.logger.info("%s\n", '='*60)
         
         return results
 
@@ -538,51 +761,38 @@ def main():
     if not args.url and not args.urls_file:
         parser.error("Specify --url or --urls-file (or create urls.txt in project root)")
     
-    orchestrator = PipelineOrchestrator(args.config, domain=args.domain)
+    # Check OpenAI API key (still needed for text processing) до тяжелой инициализации оркестратора
+    load_env()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("[ERROR] OPENAI_API_KEY environment variable not set")
+        print("Make sure your .env file contains: OPENAI_API_KEY=your-key-here")
+        return 1
+    
+    # --index-to-vector-db включает индексацию до инициализации: модель эмбеддингов грузится один раз
+    if args.index_to_vector_db and not _load_config(args.config).get('vector_db'):
+        print("[ERROR] Vector DB не настроен в config.yaml")
+        return 1
+    
+    orchestrator = PipelineOrchestrator(
+        args.config,
+        domain=args.domain,
+        enable_vector_db=True if args.index_to_vector_db else None
+    )
     
-    # Включаем индексацию если указан флаг
     if args.index_to_vector_db:
-        if orchestrator.config.get('vector_db'):
-            orchestrator.config['vector_db']['auto_index'] = True
-            # Переинициализируем векторный индексатор
-            try:
-                from vector_db import VectorDBManager, EmbeddingService, VectorIndexer
-                db_manager = VectorDBManager(
-                    db_path=orchestrator.config['vector_db']['db_path'],
-                    collection_prefix=orchestrator.config['vector_db']['collection_prefix']
-                )
-                
-                # Модель: сначала из env, потом из config
-                embedding_model = os.getenv("SENTENCE_TRANSFORMERS_MODEL") or orchestrator.config['vector_db']['embedding'].get('model')
-                embedding_service = EmbeddingService(model=embedding_model)
-                orchestrator.vector_indexer = VectorIndexer(
-                    db_manager=db_manager,
-                    embedding_service=embedding_service,
-                    batch_size=orchestrator.config['vector_db'].get('batch_size', 100)
-                )
-                orchestrator.logger.info("✅ Vector DB индексация активирована через CLI флаг")
-            except Exception as e:
-                orchestrator.logger.error(f"Ошибка при инициализации Vector DB: {e}")
-                return 1
-        else:
-            orchestrator.logger.error("Vector DB не настроен в config.yaml")
+        if orchestrator.vector_indexer is None:
+            orchestrator.logger.error("Ошибка при инициализации Vector DB (см. предупреждение выше)")
             return 1
-    
-    # Check OpenAI API key (still needed for text processing)
-    if not os.getenv("OPENAI_API_KEY"):
-        orchestrator.logger.error("OPENAI_API_KEY environment variable not set")
-        orchestrator.logger.info("Make sure your .env file contains: OPENAI_API_KEY=your-key-here")
-        return 1
+        orchestrator.logger.info("✅ Vector DB индексация активирована через CLI флаг")
     
     if args.url:
         result = orchestrator.run_full_pipeline(args.url, args.name)
         
         # Сохраняем результаты в raw_subtitles папку (не в SAG!)
-        results_dir = Path(orchestrator.config['pipeline']['subtitles']['output_dir'])
+        results_dir = orchestrator._subtitles_dir
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         results_file = results_dir / f"pipeline_result_{timestamp}.json"
-        with open(results_file, "w") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        results_file.write_bytes(_dumps_result(result))
         
         print(f"\n[SUCCESS] Pipeline results saved: {results_file}")
         
@@ -595,28 +805,52 @@ def main():
             return 1
     
     elif args.urls_file:
-        results = orchestrator.run_batch_pipeline(args.urls_file)
-        
         # Сохраняем batch результаты в raw_subtitles папку (не в SAG!)
-        results_dir = Path(orchestrator.config['pipeline']['subtitles']['output_dir'])
+        results_dir = orchestrator._subtitles_dir
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         results_file = results_dir / f"batch_pipeline_results_{timestamp}.json"
-        with open(results_file, "w", encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        
-        # Очищаем старые batch результаты (оставляем только последние 2)
-        batch_results = list(results_dir.glob("batch_pipeline_results_*.json"))
-        if len(batch_results) > 2:
-            batch_results.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-            for old_batch in batch_results[2:]:
-                old_batch.unlink()
-                orchestrator.logger.info(f"🗑️ Old batch result removed: {old_batch.name}")
-        
-        successful = sum(1 for r in results if r["status"] == "success")
-        print(f"\n[BATCH COMPLETE] SAG v2.0: {successful}/{len(results)} URLs processed successfully")
+        progress_file = results_file.with_suffix(".jsonl")
+        # Снимок batch-результатов может занимать десятки МБ — сжимаем gzip (быстрый уровень 1)
+        compress = orchestrator.config['pipeline'].get('compress_batch_results', False)
+        if compress:
+            results_file = results_file.with_name(results_file.name + ".gz")
+        
+        results = orchestrator.run_batch_pipeline(args.urls_file, progress_file=str(progress_file))
+        
+        # Итоговый снимок пишется во временный файл и атомарно подменяется
+        results_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = results_file.with_name(results_file.name + ".tmp")
+        payload = _dumps_result(results)
+        if compress:
+            with gzip.open(tmp_file, "wb", compresslevel=1) as f:
+                f.write(payload)
+        else:
+            tmp_file.write_bytes(payload)
+        os.replace(tmp_file, results_file)
+        # Снимок полный — построчный журнал прогресса больше не нужен
+        progress_file.unlink(missing_ok=True)
+        
+        # Очищаем старые batch результаты (оставляем только последние 2).
+        # Метка времени в имени сортируется лексикографически — stat() не нужен
+        batch_results = sorted(
+            (p for p in results_dir.glob("batch_pipeline_results_*")
+             if p.name.endswith((".json", ".json.gz"))),
+            reverse=True
+        )
+        for old_batch in batch_results[2:]:
+            old_batch.unlink()
+            orchestrator.logger.info("🗑️ Old batch result removed: %s", old_batch.name)
+        
+        # Один проход по результатам: счетчики по всем статусам сразу
+        status_counts = Counter(r.get("status") for r in results)
+        total = len(results)
+        successful = status_counts["success"]
+        print(f"\n[BATCH COMPLETE] SAG v2.0: {successful}/{total} URLs processed successfully")
+        if successful != total:
+            print(f"[STATUS] {dict(status_counts)}")
         print(f"[RESULTS] Saved to: {results_file}")
         
-        return 0 if successful == len(results) else 1
+        return 0 if successful == total else 1
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -5,37 +5,100 @@
 Анализирует выходной JSON файл и показывает статус всех фич.
 """
 
-import json
+import math
 import sys
 import os
 from pathlib import Path
 from typing import Dict, Any, List
 
-# Установка UTF-8 для Windows
+import orjson
+
+# Установка UTF-8 для Windows: reconfigure меняет поток на месте и сохраняет построчную буферизацию
 if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    for _stream in (sys.stdout, sys.stderr):
+        if (getattr(_stream, 'encoding', None) or '').lower() != 'utf-8':
+            _stream.reconfigure(encoding='utf-8')
 
 
 class FeatureChecker:
     """Проверяет наличие и качество реализованных фич."""
 
+    # Поля модуля безопасности, по которым считаются итоги
+    _SAFETY_FIELDS = (
+        'contraindications',
+        'limitations',
+        'when_to_stop',
+        'when_to_seek_professional_help',
+        'red_flags',
+        'notes',
+    )
+    
+    # Обязательные поля практики
+    _PRACTICE_REQUIRED_FIELDS = frozenset({'title', 'steps'})
+    
+    # Уровни иерархии концептов для классификации базовых/продвинутых
+    _FUNDAMENTAL_LEVELS = frozenset({'fundamental', 'root', 'domain'})
+    _ADVANCED_LEVELS = frozenset({'advanced', 'practice', 'technique'})
+
     def __init__(self, json_path: Path):
         self.json_path = json_path
         self.data = None
         self.results = {}
+        self._block_scan = None
     
     def load_data(self) -> bool:
         """Загружает JSON файл."""
         try:
-            with open(self.json_path, encoding='utf-8') as f:
-                self.data = json.load(f)
+            # orjson разбирает байты напрямую, без промежуточного декодирования в str
+            with open(self.json_path, 'rb') as f:
+                self.data = orjson.loads(f.read())
             return True
         except Exception as e:
             print(f"❌ Ошибка загрузки файла: {e}")
             return False
     
+    def _scan_blocks(self) -> Dict[str, Any]:
+        """Один проход по блокам: собирает practices, safety и concept_hierarchy для check_* методов."""
+        if self._block_scan is not None:
+            return self._block_scan
+        
+        practices = []
+        safety_data = []
+        hierarchies = []
+        blocks_with_hierarchy = 0
+        # Методы списков привязаны к локальным именам: в цикле нет поиска атрибутов
+        add_practice, add_practices = practices.append, practices.extend
+        add_safety = safety_data.append
+        add_hierarchy, add_hierarchies = hierarchies.append, hierarchies.extend
+        
+        for block in self.data.get('blocks', []):
+            block_practices = block.get('practices')
+            if block_practices:
+                if isinstance(block_practices, list):
+                    add_practices(block_practices)
+                else:
+                    add_practice(block_practices)
+            
+            if 'safety' in block:
+                add_safety(block['safety'])
+            
+            if 'concept_hierarchy' in block:
+                hierarchy_data = block['concept_hierarchy']
+                if hierarchy_data:
+                    blocks_with_hierarchy += 1
+                if isinstance(hierarchy_data, list):
+                    add_hierarchies(hierarchy_data)
+                elif isinstance(hierarchy_data, dict):
+                    add_hierarchy(hierarchy_data)
+        
+        self._block_scan = {
+            'practices': practices,
+            'safety': safety_data,
+            'concept_hierarchy': hierarchies,
+            'blocks_with_hierarchy': blocks_with_hierarchy,
+        }
+        return self._block_scan
+    
     def check_practices(self) -> Dict[str, Any]:
         """Проверяет экстрактор практик."""
         result = {
@@ -58,11 +121,7 @@ class FeatureChecker:
         
         # Если нет на верхнем уровне, проверяем блоки
         if not practices_found:
-            blocks = self.data.get('blocks', [])
-            
-            for block in blocks:
-                if 'practices' in block and block['practices']:
-                    practices_found.extend(block['practices'] if isinstance(block['practices'], list) else [block['practices']])
+            practices_found.extend(self._scan_blocks()['practices'])
         
         if not practices_found:
             result['issues'].append('Ключ "practices" отсутствует на верхнем уровне и в блоках или пуст')
@@ -83,10 +142,12 @@ class FeatureChecker:
         }
         
         # Проверка структуры
-        required_fields = ['title', 'steps']
-        missing = [f for f in required_fields if f not in first and f not in first.get('name', '')]
+        missing = self._PRACTICE_REQUIRED_FIELDS - first.keys()
+        # Название практики может лежать в 'name' вместо 'title' (как и в details выше)
+        if 'name' in first:
+            missing.discard('title')
         if missing:
-            result['issues'].append(f'Отсутствуют поля: {missing}')
+            result['issues'].append(f'Отсутствуют поля: {sorted(missing)}')
         
         if len(first.get('steps', [])) < 2:
             result['issues'].append('Недостаточно шагов в практике (< 2)')
@@ -106,13 +167,8 @@ class FeatureChecker:
         
         # Если нет на верхнем уровне, проверяем блоки
         if not global_safety:
-            blocks = self.data.get('blocks', [])
-            all_safety_data = []
-            
-            # Собираем все данные safety из всех блоков
-            for block in blocks:
-                if 'safety' in block:
-                    all_safety_data.append(block['safety'])
+            # Все данные safety из всех блоков
+            all_safety_data = self._scan_blocks()['safety']
             
             if not all_safety_data:
                 result['issues'].append('Ключ "global_safety" отсутствует на верхнем уровне и в блоках')
@@ -129,42 +185,33 @@ class FeatureChecker:
         
         result['implemented'] = True
         
-        # Агрегируем данные из всех блоков
-        total_contraindications = 0
-        total_limitations = 0
-        total_when_to_stop = 0
-        total_when_to_seek_help = 0
-        total_red_flags = 0
-        total_notes = 0
+        # Агрегируем данные из всех блоков: одно обращение к каждому полю
+        totals = dict.fromkeys(self._SAFETY_FIELDS, 0)
         blocks_with_data = 0
         
         for safety_data in all_safety_data:
             if isinstance(safety_data, dict):
-                total_contraindications += len(safety_data.get('contraindications', []))
-                total_limitations += len(safety_data.get('limitations', []))
-                total_when_to_stop += len(safety_data.get('when_to_stop', []))
-                total_when_to_seek_help += len(safety_data.get('when_to_seek_professional_help', []))
-                total_red_flags += len(safety_data.get('red_flags', []))
-                total_notes += len(safety_data.get('notes', []))
+                has_data = False
+                for field in self._SAFETY_FIELDS:
+                    count = len(safety_data.get(field, ()))
+                    if count:
+                        totals[field] += count
+                        has_data = True
                 
-                # Проверяем, есть ли хотя бы какие-то данные
-                if any([
-                    len(safety_data.get('contraindications', [])),
-                    len(safety_data.get('limitations', [])),
-                    len(safety_data.get('when_to_stop', [])),
-                    len(safety_data.get('when_to_seek_professional_help', [])),
-                    len(safety_data.get('red_flags', [])),
-                    len(safety_data.get('notes', []))
-                ]):
+                # Есть ли хотя бы какие-то данные
+                if has_data:
                     blocks_with_data += 1
         
+        total_when_to_seek_help = totals['when_to_seek_professional_help']
+        total_notes = totals['notes']
+        
         # Подсчет элементов
         result['details'] = {
-            'contraindications': total_contraindications,
-            'limitations': total_limitations,
-            'when_to_stop': total_when_to_stop,
+            'contraindications': totals['contraindications'],
+            'limitations': totals['limitations'],
+            'when_to_stop': totals['when_to_stop'],
             'when_to_seek_help': total_when_to_seek_help,
-            'red_flags': total_red_flags,
+            'red_flags': totals['red_flags'],
             'notes': total_notes,
             'blocks_with_safety': len(all_safety_data),
             'blocks_with_data': blocks_with_data
@@ -208,16 +255,8 @@ class FeatureChecker:
         
         # Если нет на верхнем уровне, проверяем блоки
         if not all_hierarchies:
-            blocks = self.data.get('blocks', [])
-            
-            # Собираем все concept_hierarchy из всех блоков
-            for block in blocks:
-                if 'concept_hierarchy' in block:
-                    hierarchy_data = block['concept_hierarchy']
-                    if isinstance(hierarchy_data, list) and hierarchy_data:
-                        all_hierarchies.extend(hierarchy_data)
-                    elif isinstance(hierarchy_data, dict):
-                        all_hierarchies.append(hierarchy_data)
+            # Все concept_hierarchy из всех блоков
+            all_hierarchies.extend(self._scan_blocks()['concept_hierarchy'])
         
         if not all_hierarchies:
             result['issues'].append('Ключ "concept_hierarchy" отсутствует на верхнем уровне и в блоках или все массивы пустые')
@@ -235,19 +274,22 @@ class FeatureChecker:
         for hierarchy in all_hierarchies:
             if isinstance(hierarchy, dict):
                 level = hierarchy.get('level', '').lower()
-                if 'fundamental' in level or level == 'root' or level == 'domain':
+                if level in self._FUNDAMENTAL_LEVELS or 'fundamental' in level:
                     fundamental_count += 1
-                    if hierarchy.get('name'):
-                        fundamental_concepts.append(hierarchy.get('name'))
-                elif 'advanced' in level or level == 'practice' or level == 'technique':
+                    # В отчет попадают только первые 5 имен
+                    if len(fundamental_concepts) < 5:
+                        name = hierarchy.get('name')
+                        if name:
+                            fundamental_concepts.append(name)
+                elif level in self._ADVANCED_LEVELS or 'advanced' in level:
                     advanced_count += 1
         
         result['details'] = {
             'total_concepts': total_concepts,
             'fundamental_count': fundamental_count,
             'advanced_count': advanced_count,
-            'fundamental_concepts': fundamental_concepts[:5],
-            'blocks_with_hierarchy': len([b for b in blocks if 'concept_hierarchy' in b and b['concept_hierarchy']])
+            'fundamental_concepts': fundamental_concepts,
+            'blocks_with_hierarchy': self._scan_blocks()['blocks_with_hierarchy']
         }
         
         # Проверки
@@ -283,22 +325,38 @@ class FeatureChecker:
         
         # Проверка весов
         if edges:
-            weights = [e.get('confidence', 0) for e in edges if 'confidence' in e]
+            # min/max/сумма/уникальные значения за один проход по рёбрам
+            min_weight = math.inf
+            max_weight = -math.inf
+            total_weight = 0.0
+            weights_count = 0
+            unique_weights = set()
+            for e in edges:
+                if 'confidence' not in e:
+                    continue
+                weight = e['confidence']
+                if weight < min_weight:
+                    min_weight = weight
+                if weight > max_weight:
+                    max_weight = weight
+                total_weight += weight
+                weights_count += 1
+                unique_weights.add(weight)
             
-            if not weights:
+            if not weights_count:
                 result['issues'].append('Рёбра не содержат поле "confidence"')
             else:
                 result['details']['weights'] = {
-                    'min': round(min(weights), 3),
-                    'max': round(max(weights), 3),
-                    'avg': round(sum(weights) / len(weights), 3),
-                    'unique_count': len(set(weights))
+                    'min': round(min_weight, 3),
+                    'max': round(max_weight, 3),
+                    'avg': round(total_weight / weights_count, 3),
+                    'unique_count': len(unique_weights)
                 }
                 
                 # Проверка на разнообразие весов
-                if len(set(weights)) == 1:
+                if len(unique_weights) == 1:
                     result['issues'].append(
-                        f'Все веса одинаковые: {weights[0]} (нужно разнообразие!)'
+                        f'Все веса одинаковые: {min_weight} (нужно разнообразие!)'
                     )
                 elif result['details']['weights']['unique_count'] < 3:
                     result['issues'].append(
@@ -482,6 +540,8 @@ class FeatureChecker:
         if not self.load_data():
             return False
         
+        # Блоки обходятся один раз; check_* используют собранные списки
+        self._scan_blocks()
         self.results['practices'] = self.check_practices()
         self.results['global_safety'] = self.check_global_safety()
         self.results['concept_hierarchy'] = self.check_concept_hierarchy()
@@ -499,16 +559,13 @@ def find_latest_json() -> Path:
     if not base_dir.exists():
         raise FileNotFoundError(f"Директория {base_dir} не найдена")
     
-    # Найти все .for_vector.json файлы
-    json_files = list(base_dir.rglob('*.for_vector.json'))
+    # Самый свежий .for_vector.json за один проход, без списка и сортировки
+    newest = max(base_dir.rglob('*.for_vector.json'), key=lambda p: p.stat().st_mtime, default=None)
     
-    if not json_files:
+    if newest is None:
         raise FileNotFoundError("Не найдено ни одного .for_vector.json файла")
     
-    # Отсортировать по времени модификации
-    json_files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    
-    return json_files[0]
+    return newest
 
 
 def main():
@@ -11,6 +11,23 @@ import re
 from typing import List, Dict
 from urllib.parse import urlparse, parse_qs
 
+# Шаблоны YouTube URL компилируются один раз; варианты объединены в одну альтернацию
+# youtube.com/watch?v=ID, youtu.be/ID, youtube.com/embed/ID
+_YT_URL_RE = re.compile(
+    r'https?://(?:(?:www\.)?youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)([a-zA-Z0-9_-]{11})'
+)
+# Для извлечения id шаблоны проверяются по порядку: параметр v= приоритетнее пути
+_YT_VIDEO_ID_PATTERNS = tuple(re.compile(p) for p in (
+    r'[?&]v=([a-zA-Z0-9_-]{11})',
+    r'youtu\.be/([a-zA-Z0-9_-]{11})',
+    r'embed/([a-zA-Z0-9_-]{11})',
+))
+# Быстрый отсев по префиксу до запуска регулярного выражения
+_YT_URL_PREFIXES = (
+    'https://youtube.com', 'https://www.youtube.com', 'https://youtu.be',
+    'http://youtube.com', 'http://www.youtube.com', 'http://youtu.be',
+)
+
 def search_youtube_channel(channel_name: str = "Саламат Сарсекенов", max_results: int = 50) -> List[str]:
     """
     Поиск видео с канала по названию
@@ -37,40 +54,26 @@ def search_youtube_channel(channel_name: str = "Саламат Сарсекен
 
 def validate_youtube_url(url: str) -> bool:
     """Проверка корректности YouTube URL"""
-    youtube_patterns = [
-        r'https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'https?://youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'https?://(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]{11})'
-    ]
-    
-    for pattern in youtube_patterns:
-        if re.match(pattern, url):
-            return True
-    return False
+    return url.startswith(_YT_URL_PREFIXES) and _YT_URL_RE.match(url) is not None
 
 def extract_video_id(url: str) -> str:
     """Извлечение video_id из YouTube URL"""
-    patterns = [
-        r'[?&]v=([a-zA-Z0-9_-]{11})',
-        r'youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'embed/([a-zA-Z0-9_-]{11})'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
+    for pattern in _YT_VIDEO_ID_PATTERNS:
+        match = pattern.search(url)
         if match:
             return match.group(1)
     return None
 
 def create_urls_file(urls: List[str], filename: str = "test_urls_batch.txt") -> None:
     """Создание файла с URL-ами"""
+    # Содержимое собирается целиком и пишется одним вызовом
+    body = "".join(f"# Видео {i}\n{url}\n\n" for i, url in enumerate(urls, 1))
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write("# Тестовые URL-ы для пакетной обработки (50 видео)\n")
-        f.write("# Канал Саламата Сарсекенова - нейросталкинг/неосталкинг\n\n")
-        
-        for i, url in enumerate(urls, 1):
-            f.write(f"# Видео {i}\n")
-            f.write(f"{url}\n\n")
+        f.write(
+            "# Тестовые URL-ы для пакетной обработки (50 видео)\n"
+            "# Канал Саламата Сарсекенова - нейросталкинг/неосталкинг\n\n"
+            f"{body}"
+        )
     
     print(f"✅ Файл создан: {filename}")
     print(f"📊 Количество URL-ов: {len(urls)}")
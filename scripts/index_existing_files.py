@@ -5,17 +5,22 @@
 """
 
 import argparse
-import json
 import logging
+import multiprocessing
 import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import orjson
+
 # Добавляем корневую директорию проекта в путь
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
-from vector_db import VectorDBManager, EmbeddingService, VectorIndexer
+from vector_db import VectorDBManager, VectorIndexer, get_embedding_service
 from env_utils import load_env
 import yaml
 
@@ -26,6 +31,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Сколько файлов читается и разбирается заранее, пока индексируется текущий
+PREFETCH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _load_sag_json(json_path: Path):
+    """Чтение и разбор SAG JSON (выполняется в пуле потоков)"""
+    with open(json_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+# Индексатор рабочего процесса (--jobs): только эмбеддинги, без ChromaDB
+_worker_indexer = None
+
+
+def _init_worker(embedding_model, embedding_batch_size: int, jobs: int):
+    """Инициализация рабочего процесса: своя копия модели, без клиента ChromaDB"""
+    global _worker_indexer
+    # Потоки torch делятся между процессами, иначе ядра переподписываются
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // jobs))
+    except ImportError:
+        pass
+    _worker_indexer = VectorIndexer(
+        db_manager=None,
+        embedding_service=get_embedding_service(model=embedding_model),
+        embedding_batch_size=embedding_batch_size
+    )
+
+
+def _embed_sag_file(json_path: Path, index_levels):
+    """Чтение, разбор и векторизация SAG JSON в рабочем процессе"""
+    return _worker_indexer.embed_sag_dict(_load_sag_json(json_path), index_levels)
+
+
+def _write_results(results_file: Path, summary: dict, details_file: Path):
+    """
+    Запись indexing_results.json в прежнем формате: счетчики + массив details.
+    details читается из JSONL только в конце прогона — во время индексации
+    результаты по файлам в памяти не копятся.
+    """
+    with open(details_file, 'rb') as details:
+        rows = [orjson.loads(line) for line in details if line.strip()]
+    with open(results_file, 'wb') as out:
+        out.write(orjson.dumps({**summary, "details": rows}, option=orjson.OPT_INDENT_2))
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -53,6 +104,14 @@ def main():
         choices=["documents", "blocks", "graph_entities"],
         help="Уровни для индексации (по умолчанию: все)"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Число процессов для эмбеддингов (по умолчанию: 1). Запись в ChromaDB "
+             "всегда выполняет основной процесс — PersistentClient не поддерживает "
+             "несколько процессов-писателей"
+    )
     
     args = parser.parse_args()
     
@@ -81,11 +140,15 @@ def main():
         
         # Модель: сначала из env, потом из config
         embedding_model = os.getenv("SENTENCE_TRANSFORMERS_MODEL") or config['vector_db']['embedding'].get('model')
-        embedding_service = EmbeddingService(model=embedding_model)
+        embedding_batch_size = config['vector_db']['embedding'].get('batch_size', 64)
+        # При --jobs > 1 модель загружают только рабочие процессы
+        parallel = args.jobs > 1
+        embedding_service = None if parallel else get_embedding_service(model=embedding_model)
         indexer = VectorIndexer(
             db_manager=db_manager,
             embedding_service=embedding_service,
-            batch_size=config['vector_db'].get('batch_size', 100)
+            batch_size=config['vector_db'].get('batch_size', 100),
+            embedding_batch_size=embedding_batch_size
         )
     except Exception as e:
         logger.error(f"Ошибка при инициализации компонентов: {e}", exc_info=True)
@@ -104,40 +167,87 @@ def main():
     
     logger.info(f"📂 Найдено файлов для индексации: {len(json_files)}")
     
-    # Индексация файлов
+    # Индексация файлов: в памяти только счетчики, результат по каждому файлу
+    # сразу дописывается строкой в indexing_results.jsonl
+    details_file = input_dir / "indexing_results.jsonl"
     results = {
         "total_files": len(json_files),
         "successful": 0,
         "failed": 0,
-        "details": []
+        "indexed": {"documents": 0, "blocks": 0, "graph_entities": 0, "knowledge_graph": 0},
+        "details_file": str(details_file)
     }
     
-    for i, json_file in enumerate(json_files, 1):
-        logger.info(f"📝 [{i}/{len(json_files)}] Индексация: {json_file.name}")
+    # Чтение/разбор JSON идет в пуле потоков с ограниченным окном упреждения,
+    # а индексация (эмбеддинги + запись в Chroma) — в основном потоке по порядку.
+    # С --jobs N разбор и эмбеддинги считаются в N процессах, запись — по-прежнему здесь
+    if parallel:
+        logger.info(f"⚙️ Эмбеддинги в {args.jobs} процессах")
+        workers = args.jobs
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(embedding_model, embedding_batch_size, args.jobs)
+        )
+        task = partial(_embed_sag_file, index_levels=args.levels)
+    else:
+        workers = PREFETCH_WORKERS
+        pool = ThreadPoolExecutor(max_workers=workers)
+        task = _load_sag_json
+    
+    with pool, open(details_file, 'wb') as details:
+        def record(detail: dict):
+            details.write(orjson.dumps(detail) + b"\n")
+            details.flush()
+        
+        pending = deque()
+        files_iter = iter(json_files)
+        for json_file in files_iter:
+            pending.append((json_file, pool.submit(task, json_file)))
+            if len(pending) >= 2 * workers:
+                break
         
-        try:
-            result = indexer.index_sag_file(json_file, index_levels=args.levels)
-            results["details"].append(result)
+        i = 0
+        while pending:
+            json_file, future = pending.popleft()
+            next_file = next(files_iter, None)
+            if next_file is not None:
+                pending.append((next_file, pool.submit(task, next_file)))
+            i += 1
+            logger.info(f"📝 [{i}/{len(json_files)}] Индексация: {json_file.name}")
             
-            if result["success"]:
-                results["successful"] += 1
-                logger.info(
-                    f"✅ Успешно: документов={result['indexed']['documents']}, "
-                    f"блоков={result['indexed']['blocks']}, "
-                    f"сущностей={result['indexed']['graph_entities']}"
-                )
-            else:
-                results["failed"] += 1
-                logger.error(f"❌ Ошибка: {result.get('error', 'Unknown error')}")
+            try:
+                if parallel:
+                    result = indexer.index_sag_dict(
+                        None, index_levels=args.levels, source=json_file.name, embedded=future.result()
+                    )
+                else:
+                    result = indexer.index_sag_dict(future.result(), index_levels=args.levels, source=json_file.name)
+                result["file"] = str(json_file)
+                record(result)
                 
-        except Exception as e:
-            results["failed"] += 1
-            logger.error(f"❌ Исключение при индексации {json_file.name}: {e}", exc_info=True)
-            results["details"].append({
-                "file": str(json_file),
-                "success": False,
-                "error": str(e)
-            })
+                if result["success"]:
+                    results["successful"] += 1
+                    for level, count in result["indexed"].items():
+                        results["indexed"][level] = results["indexed"].get(level, 0) + count
+                    logger.info(
+                        f"✅ Успешно: документов={result['indexed']['documents']}, "
+                        f"блоков={result['indexed']['blocks']}, "
+                        f"сущностей={result['indexed']['graph_entities']}"
+                    )
+                else:
+                    results["failed"] += 1
+                    logger.error(f"❌ Ошибка: {result.get('error', 'Unknown error')}")
+                    
+            except Exception as e:
+                results["failed"] += 1
+                logger.error(f"❌ Исключение при индексации {json_file.name}: {e}", exc_info=True)
+                record({
+                    "file": str(json_file),
+                    "success": False,
+                    "error": str(e)
+                })
     
     # Итоговая статистика
     logger.info("\n" + "="*60)
@@ -148,19 +258,14 @@ def main():
     logger.info(f"❌ Ошибок: {results['failed']}")
     
     if results['successful'] > 0:
-        total_docs = sum(d.get('indexed', {}).get('documents', 0) for d in results['details'] if d.get('success'))
-        total_blocks = sum(d.get('indexed', {}).get('blocks', 0) for d in results['details'] if d.get('success'))
-        total_entities = sum(d.get('indexed', {}).get('graph_entities', 0) for d in results['details'] if d.get('success'))
-        
         logger.info(f"\n📈 Проиндексировано:")
-        logger.info(f"  - Документов: {total_docs}")
-        logger.info(f"  - Блоков: {total_blocks}")
-        logger.info(f"  - Граф-сущностей: {total_entities}")
+        logger.info(f"  - Документов: {results['indexed']['documents']}")
+        logger.info(f"  - Блоков: {results['indexed']['blocks']}")
+        logger.info(f"  - Граф-сущностей: {results['indexed']['graph_entities']}")
     
-    # Сохранение результатов
+    # Сохранение итогов: счетчики + details (собираются из details_file)
     results_file = input_dir / "indexing_results.json"
-    with open(results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    _write_results(results_file, results, details_file)
     logger.info(f"\n💾 Результаты сохранены: {results_file}")
     
     return 0 if results['failed'] == 0 else 1
@@ -6,20 +6,26 @@
     python -m scripts.migrate_add_sd_labels
     python -m scripts.migrate_add_sd_labels --collection salamat_blocks --batch-size 50 --dry-run
 
-Идемпотентен: повторный запуск пропускает уже размеченные блоки.
+Идемпотентен: повторный запуск пропускает уже размеченные блоки, а результаты
+LLM кэшируются по хешу текста (data/cache/sd_labels.sqlite) — повторы и
+дубликаты не тратят запросы к OpenAI.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import logging
 import os
+import sqlite3
 import sys
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
 import chromadb
+import orjson
 from chromadb.config import Settings
 from chromadb.errors import NotFoundError
 
@@ -28,7 +34,7 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT_DIR))
 
 from env_utils import load_env  # noqa: E402
-from text_processor.sd_labeler import SDLabeler  # noqa: E402
+from text_processor.sd_labeler import SD_LEVELS, SDLabeler  # noqa: E402
 
 # ──────────────────────────────────────────────────────────────
 # Логирование
@@ -52,6 +58,10 @@ DEFAULT_COLLECTION = "salamat_blocks"
 DEFAULT_BATCH_SIZE = 50
 DEFAULT_CHROMA_PATH = str(ROOT_DIR / "data" / "chroma_db")
 DEFAULT_LLM_MODEL = "gpt-4o-mini"
+DEFAULT_MAX_WORKERS = 4  # одновременных запросов к OpenAI; больше — через --max-workers с учетом rate limits
+DEFAULT_BULK_SIZE = 1  # блоков в одном запросе к LLM (>1 — опционально, меняет промпт)
+DEFAULT_FLUSH_SIZE = 1000  # сколько обновлений metadata копить до одного collection.update()
+DEFAULT_LABEL_CACHE = str(ROOT_DIR / "data" / "cache" / "sd_labels.sqlite")
 
 
 # ══════════════════════════════════════════════════════════════
@@ -71,9 +81,9 @@ def get_chroma_collection(
         settings=Settings(anonymized_telemetry=False),
     )
     collection = client.get_collection(name=collection_name)
+    # count() — полный проход по SQLite; размер коллекции считается один раз в fetch_unlabeled_ids
     logger.info(
-        f"[CHROMA] Подключено к коллекции '{collection_name}' "
-        f"({chroma_path}), всего документов: {collection.count()}"
+        f"[CHROMA] Подключено к коллекции '{collection_name}' ({chroma_path})"
     )
     return collection
 
@@ -81,87 +91,212 @@ def get_chroma_collection(
 def fetch_unlabeled_ids(
     collection: chromadb.Collection,
     batch_size: int = 1000,
-) -> list[str]:
+) -> dict[str, dict]:
     """
-    Найти все document_id, у которых НЕТ поля sd_level в metadata.
-
-    ChromaDB не поддерживает $not_exists — загружаем все документы
-    страницами и фильтруем на Python стороне.
-    Возвращает список id без SD-разметки.
+    Найти все document_id, у которых НЕТ поля sd_level в metadata,
+    а также блоки с fallback-разметкой после ошибки LLM (для повтора).
+
+    ChromaDB не поддерживает $exists, а $ne/$nin для отсутствующего ключа
+    ведут себя по-разному в разных версиях. Поэтому:
+      1. страницами забираем только id (include=[]), без metadata;
+      2. id с известным уровнем СД отбираем на стороне сервера через $in;
+      3. metadata загружаем только для оставшихся кандидатов
+         (нет sd_level или нестандартное значение) и проверяем точно;
+      4. блоки с sd_labeling_needs_retry (и fallback-записи старых запусков,
+         где флага еще не было) добавляем отдельным запросом с where.
+    Возвращает id без SD-разметки (в порядке сканирования) вместе с уже
+    загруженной metadata — process_batch не запрашивает ее повторно.
     """
-    unlabeled_ids: list[str] = []
+    all_ids: list[str] = []
     offset = 0
     total = collection.count()
 
     logger.info(f"[SCAN] Сканирование {total} документов...")
 
     while offset < total:
+        ids = collection.get(limit=batch_size, offset=offset, include=[])["ids"]
+        all_ids.extend(ids)
+        offset += len(ids)
+        logger.info(f"[SCAN] Прогресс: {min(offset, total)}/{total} id получено")
+
+        # Безопасный выход если ChromaDB вернул пустой срез
+        if not ids:
+            break
+
+    labeled = set(
+        collection.get(where={"sd_level": {"$in": list(SD_LEVELS)}}, include=[])["ids"]
+    )
+    candidates = [doc_id for doc_id in all_ids if doc_id not in labeled]
+
+    unlabeled: dict[str, dict] = {}
+    for start in range(0, len(candidates), batch_size):
         result = collection.get(
-            limit=batch_size,
-            offset=offset,
+            ids=candidates[start : start + batch_size],
             include=["metadatas"],
         )
-        ids = result["ids"]
-        metadatas = result["metadatas"]
-
-        for doc_id, meta in zip(ids, metadatas):
+        for doc_id, meta in zip(result["ids"], result["metadatas"]):
             if not meta or "sd_level" not in meta:
-                unlabeled_ids.append(doc_id)
+                unlabeled[doc_id] = meta or {}
+
+    retry = collection.get(
+        where={"$or": [
+            {"sd_labeling_needs_retry": True},
+            {"sd_labeled_by": "migrate_v4_fallback"},
+        ]},
+        include=["metadatas"],
+    )
+    if retry["ids"]:
+        for doc_id, meta in zip(retry["ids"], retry["metadatas"]):
+            unlabeled.setdefault(doc_id, meta or {})
+        logger.info(f"[SCAN] Повтор после ошибок LLM: {len(retry['ids'])} блоков")
 
-        offset += len(ids)
-        logger.info(
-            f"[SCAN] Прогресс: {min(offset, total)}/{total} проверено, "
-            f"найдено без разметки: {len(unlabeled_ids)}"
-        )
+    logger.info(f"[SCAN] [OK] Итого без SD-разметки: {len(unlabeled)} блоков")
+    return unlabeled
 
-        # Безопасный выход если ChromaDB вернул пустой срез
-        if not ids:
-            break
 
-    logger.info(f"[SCAN] [OK] Итого без SD-разметки: {len(unlabeled_ids)} блоков")
-    return unlabeled_ids
+class SDLabelCache:
+    """
+    Постоянный кэш SD-разметки: sha256(model + "|" + текст) -> sd_data.
+
+    Используется только из основного потока (поиск до пула, запись после),
+    поэтому блокировки не нужны.
+    """
+
+    def __init__(self, cache_path: str, model: str) -> None:
+        self.model = model
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sd_labels (hash TEXT PRIMARY KEY, model TEXT, data TEXT)"
+        )
+        self._conn.commit()
+        self.hits = 0
+
+    def key(self, document: str) -> str:
+        return hashlib.sha256(f"{self.model}|{document}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, dict]:
+        found: dict[str, dict] = {}
+        # Ограничение SQLite на число параметров в запросе
+        chunk = 500
+        for start in range(0, len(keys), chunk):
+            part = keys[start : start + chunk]
+            rows = self._conn.execute(
+                f"SELECT hash, data FROM sd_labels WHERE hash IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            found.update((key, orjson.loads(data)) for key, data in rows)
+        self.hits += len(found)
+        return found
+
+    def put_many(self, items: dict[str, dict]) -> None:
+        if not items:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sd_labels (hash, model, data) VALUES (?, ?, ?)",
+            [(key, self.model, orjson.dumps(data).decode("utf-8")) for key, data in items.items()],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
 
 
 def process_batch(
     collection: chromadb.Collection,
     labeler: SDLabeler,
     batch_ids: list[str],
-    dry_run: bool = False,
+    pending_ids: list[str],
+    pending_metadatas: list[dict],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    label_cache: Optional[SDLabelCache] = None,
+    current_metas: Optional[dict[str, dict]] = None,
+    bulk_size: int = DEFAULT_BULK_SIZE,
 ) -> tuple[int, int]:
     """
-    Прогнать один батч через SDLabeler и дозаписать metadata в ChromaDB.
+    Прогнать один батч через SDLabeler и добавить новую metadata в буфер записи.
 
     Алгоритм:
-      1. Получить документы (тексты) из ChromaDB по ids
-      2. Для каждого вызвать labeler.label_block()
+      1. Получить документы (тексты) из ChromaDB по ids; metadata берется
+         из current_metas (собрана при сканировании), если он передан
+      2. Для каждого вызвать labeler.label_block() — параллельно,
+         не более max_workers запросов одновременно (OpenAI клиент потокобезопасен);
+         блоки, найденные в label_cache, к LLM не отправляются; остальные
+         уходят группами по bulk_size блоков на запрос (label_blocks_bulk)
       3. Смержить новые SD-поля с существующей metadata
-      4. Вызвать collection.update() — документы и embeddings НЕ трогаются
+      4. Дописать ids/metadata в pending_ids/pending_metadatas — запись
+         в ChromaDB делает flush_updates() сразу для нескольких батчей
 
     Returns:
         (success_count, error_count)
     """
-    # Получаем тексты и текущую metadata для батча
+    # Получаем тексты (и metadata, если ее не собрали при сканировании) для батча
     result = collection.get(
         ids=batch_ids,
-        include=["documents", "metadatas"],
+        include=["documents"] if current_metas is not None else ["documents", "metadatas"],
     )
+    if current_metas is not None:
+        result["metadatas"] = [current_metas.get(doc_id) for doc_id in result["ids"]]
 
     success = 0
     errors = 0
 
-    updated_ids: list[str] = []
-    updated_metadatas: list[dict] = []
+    updated_ids = pending_ids
+    updated_metadatas = pending_metadatas
 
-    for doc_id, document, current_meta in zip(
+    # Ошибка возвращается вместе с результатом: сбой одного блока не обрывает батч;
+    # raise_on_error — чтобы сбой LLM не маскировался разметкой по умолчанию
+    def _label(doc_id: str, document: Optional[str]):
+        try:
+            label = labeler.label_block(block_content=document or "", block_id=doc_id, raise_on_error=True)
+            return label, None
+        except Exception as exc:
+            return None, exc
+
+    # Группа блоков — один запрос; то, чего нет в ответе, размечается по одному
+    def _label_group(group: list[tuple[str, Optional[str]]]):
+        if len(group) == 1:
+            return [_label(*group[0])]
+        try:
+            bulk = labeler.label_blocks_bulk([(doc_id, document or "") for doc_id, document in group])
+        except Exception:
+            bulk = {}
+        return [
+            (bulk[doc_id], None) if doc_id in bulk else _label(doc_id, document)
+            for doc_id, document in group
+        ]
+
+    labels: list = [None] * len(result["ids"])
+    if label_cache:
+        keys = [label_cache.key(document or "") for document in result["documents"]]
+        cached = label_cache.get_many(list(set(keys)))
+        for i, key in enumerate(keys):
+            if key in cached:
+                labels[i] = (cached[key], None)
+
+    to_label = [i for i, label in enumerate(labels) if label is None]
+    if to_label:
+        items = [(result["ids"][i], result["documents"][i]) for i in to_label]
+        step = max(1, bulk_size)
+        groups = [items[start : start + step] for start in range(0, len(items), step)]
+        workers = max(1, min(max_workers, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fresh = [label for group in executor.map(_label_group, groups) for label in group]
+        for i, label in zip(to_label, fresh):
+            labels[i] = label
+
+        if label_cache:
+            # Блоки с ошибкой LLM не кэшируем — при повторе они размечаются заново
+            label_cache.put_many({keys[i]: labels[i][0] for i in to_label if labels[i][1] is None})
+
+    for doc_id, current_meta, (sd_data, label_error) in zip(
         result["ids"],
-        result["documents"],
         result["metadatas"],
+        labels,
     ):
         try:
-            sd_data = labeler.label_block(
-                block_content=document or "",
-                block_id=doc_id,
-            )
+            if label_error is not None:
+                raise label_error
 
             # Мержим: старые поля сохраняются, SD-поля добавляются
             new_meta = dict(current_meta or {})
@@ -171,6 +306,8 @@ def process_batch(
             new_meta["complexity_score"] = sd_data.get("complexity_score", 5)
             new_meta["sd_labeled_by"] = "migrate_v4"
             new_meta["sd_labeled_at"] = _now_iso()
+            if "sd_labeling_needs_retry" in new_meta:
+                new_meta["sd_labeling_needs_retry"] = False
 
             updated_ids.append(doc_id)
             updated_metadatas.append(new_meta)
@@ -178,28 +315,45 @@ def process_batch(
 
         except Exception as exc:
             logger.error(f"[BATCH] Ошибка для block_id={doc_id}: {exc}")
-            # Fallback: пишем GREEN, не останавливаемся
+            # Fallback: пишем GREEN (безопасный уровень для бота), не останавливаемся;
+            # флаг sd_labeling_needs_retry возвращает блок в выборку при следующем запуске
             fallback_meta = dict(current_meta or {})
             fallback_meta["sd_level"] = "GREEN"
             fallback_meta["sd_secondary"] = ""
             fallback_meta["emotional_tone"] = "neutral"
             fallback_meta["sd_labeled_by"] = "migrate_v4_fallback"
             fallback_meta["sd_labeled_at"] = _now_iso()
+            fallback_meta["sd_labeling_needs_retry"] = True
 
             updated_ids.append(doc_id)
             updated_metadatas.append(fallback_meta)
             errors += 1
 
-    # Записываем в ChromaDB (только metadata, embeddings не трогаем)
-    if updated_ids and not dry_run:
+    return success, errors
+
+
+def flush_updates(
+    collection: chromadb.Collection,
+    pending_ids: list[str],
+    pending_metadatas: list[dict],
+    dry_run: bool = False,
+) -> None:
+    """
+    Записать накопленную metadata одним collection.update() и очистить буфер.
+    Документы и embeddings НЕ трогаются.
+    """
+    if not pending_ids:
+        return
+    if dry_run:
+        logger.info(f"[DRY-RUN] Пропускаем запись {len(pending_ids)} блоков")
+    else:
         collection.update(
-            ids=updated_ids,
-            metadatas=updated_metadatas,
+            ids=pending_ids,
+            metadatas=pending_metadatas,
         )
-    elif dry_run:
-        logger.info(f"[DRY-RUN] Пропускаем запись {len(updated_ids)} блоков")
-
-    return success, errors
+        logger.info(f"[WRITE] Записано в ChromaDB: {len(pending_ids)} блоков")
+    pending_ids.clear()
+    pending_metadatas.clear()
 
 
 # ══════════════════════════════════════════════════════════════
@@ -213,6 +367,10 @@ def run_migration(
     llm_model: str = DEFAULT_LLM_MODEL,
     dry_run: bool = False,
     limit: Optional[int] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    flush_size: int = DEFAULT_FLUSH_SIZE,
+    label_cache_path: Optional[str] = DEFAULT_LABEL_CACHE,
+    bulk_size: int = DEFAULT_BULK_SIZE,
 ) -> dict:
     """
     Главная функция миграции. Возвращает итоговую статистику.
@@ -224,6 +382,10 @@ def run_migration(
         llm_model: модель OpenAI для SDLabeler
         dry_run: если True — только сканирует, не пишет в БД
         limit: ограничить число обрабатываемых блоков (для тестов)
+        max_workers: максимум одновременных LLM-запросов внутри батча
+        flush_size: сколько обновлений копить до записи в ChromaDB
+        label_cache_path: SQLite-кэш SD-разметки по хешу текста (None — без кэша)
+        bulk_size: сколько блоков размечать одним запросом к LLM
     """
     logger.info("=" * 60)
     logger.info("START MIGRATION SD-РАЗМЕТКИ")
@@ -231,6 +393,9 @@ def run_migration(
     logger.info(f"   chroma_path : {chroma_path}")
     logger.info(f"   batch_size  : {batch_size}")
     logger.info(f"   model       : {llm_model}")
+    logger.info(f"   max_workers : {max_workers}")
+    logger.info(f"   flush_size  : {flush_size}")
+    logger.info(f"   bulk_size   : {bulk_size}")
     logger.info(f"   dry_run     : {dry_run}")
     logger.info("=" * 60)
 
@@ -247,7 +412,8 @@ def run_migration(
     labeler = SDLabeler(model=llm_model, temperature=0.1)
 
     # 3. Найти все блоки без sd_level
-    unlabeled_ids = fetch_unlabeled_ids(collection)
+    unlabeled = fetch_unlabeled_ids(collection)
+    unlabeled_ids = list(unlabeled)
 
     if not unlabeled_ids:
         logger.info("[OK] Все блоки уже размечены - миграция не нужна.")
@@ -262,26 +428,50 @@ def run_migration(
     total_errors = 0
     processed_count = 0
 
-    # 4. Обработка батчами
-    for batch_start in range(0, total_found, batch_size):
-        batch_ids = unlabeled_ids[batch_start : batch_start + batch_size]
-        batch_num = batch_start // batch_size + 1
-        total_batches = (total_found + batch_size - 1) // batch_size
+    label_cache = SDLabelCache(label_cache_path, llm_model) if label_cache_path else None
 
-        logger.info(
-            f"\n[BATCH {batch_num}/{total_batches}] "
-            f"Блоки {batch_start + 1}-{batch_start + len(batch_ids)} из {total_found}"
-        )
+    # 4. Обработка батчами; запись в ChromaDB — крупными порциями по flush_size
+    pending_ids: list[str] = []
+    pending_metadatas: list[dict] = []
+    try:
+        for batch_start in range(0, total_found, batch_size):
+            batch_ids = unlabeled_ids[batch_start : batch_start + batch_size]
+            batch_num = batch_start // batch_size + 1
+            total_batches = (total_found + batch_size - 1) // batch_size
+
+            logger.info(
+                f"\n[BATCH {batch_num}/{total_batches}] "
+                f"Блоки {batch_start + 1}-{batch_start + len(batch_ids)} из {total_found}"
+            )
 
-        success, errors = process_batch(collection, labeler, batch_ids, dry_run=dry_run)
-        total_success += success
-        total_errors += errors
-        processed_count += len(batch_ids)
+            success, errors = process_batch(
+                collection,
+                labeler,
+                batch_ids,
+                pending_ids,
+                pending_metadatas,
+                max_workers=max_workers,
+                label_cache=label_cache,
+                current_metas=unlabeled,
+                bulk_size=bulk_size,
+            )
+            total_success += success
+            total_errors += errors
+            processed_count += len(batch_ids)
 
-        logger.info(
-            f"[BATCH {batch_num}] [OK] {success} успешно, [ERR] {errors} ошибок "
-            f"| Всего обработано: {processed_count}/{total_found}"
-        )
+            logger.info(
+                f"[BATCH {batch_num}] [OK] {success} успешно, [ERR] {errors} ошибок "
+                f"| Всего обработано: {processed_count}/{total_found}"
+            )
+
+            if len(pending_ids) >= flush_size:
+                flush_updates(collection, pending_ids, pending_metadatas, dry_run=dry_run)
+    finally:
+        # Остаток (и уже размеченное при аварийном выходе) не теряем
+        flush_updates(collection, pending_ids, pending_metadatas, dry_run=dry_run)
+        if label_cache:
+            logger.info(f"[CACHE] Разметка из кэша: {label_cache.hits} блоков")
+            label_cache.close()
 
     # 5. Итоговая статистика по распределению SD-уровней
     distribution = _get_sd_distribution(collection, dry_run)
@@ -310,15 +500,23 @@ def _get_sd_distribution(
     collection: chromadb.Collection,
     dry_run: bool,
 ) -> dict[str, int]:
-    """Подсчитать финальное распределение sd_level по всей коллекции."""
+    """
+    Подсчитать финальное распределение sd_level по всей коллекции.
+
+    Считается на стороне ChromaDB по одному запросу на уровень (только id,
+    без metadata); блоки без sd_level или с нестандартным значением — UNKNOWN.
+    """
     if dry_run:
         return {}
 
-    result = collection.get(include=["metadatas"])
     counts: Counter = Counter()
-    for meta in result["metadatas"]:
-        level = (meta or {}).get("sd_level", "UNKNOWN")
-        counts[level] += 1
+    for level in SD_LEVELS:
+        found = len(collection.get(where={"sd_level": level}, include=[])["ids"])
+        if found:
+            counts[level] = found
+    unknown = collection.count() - sum(counts.values())
+    if unknown > 0:
+        counts["UNKNOWN"] = unknown
     return dict(counts)
 
 
@@ -337,8 +535,10 @@ def _print_final_stats(
     logger.info("-" * 40)
     if distribution:
         logger.info("   Распределение SD-уровней (вся коллекция):")
+        # Масштаб шкалы считается один раз: самый частый уровень ~ 20 символов
+        scale = max(1, max(distribution.values()) // 20)
         for level, count in sorted(distribution.items(), key=lambda x: -x[1]):
-            bar = "#" * (count // max(1, max(distribution.values()) // 20))
+            bar = "#" * (count // scale)
             logger.info(f"   {level:<12} {count:>5}  {bar}")
     logger.info("=" * 60)
 
@@ -372,6 +572,29 @@ def _parse_args() -> argparse.Namespace:
         default=DEFAULT_LLM_MODEL,
         help=f"OpenAI модель для SDLabeler (default: {DEFAULT_LLM_MODEL})",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Одновременных LLM-запросов в батче; увеличивать с учетом rate limits аккаунта (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--flush-size",
+        type=int,
+        default=DEFAULT_FLUSH_SIZE,
+        help=f"Обновлений metadata на один collection.update() (default: {DEFAULT_FLUSH_SIZE})",
+    )
+    parser.add_argument(
+        "--label-cache",
+        default=DEFAULT_LABEL_CACHE,
+        help="SQLite-кэш SD-разметки по хешу текста (пустая строка — отключить)",
+    )
+    parser.add_argument(
+        "--bulk-size",
+        type=int,
+        default=DEFAULT_BULK_SIZE,
+        help=f"Блоков в одном запросе к LLM; >1 включает пакетную разметку (default: {DEFAULT_BULK_SIZE})",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -405,6 +628,10 @@ if __name__ == "__main__":
             llm_model=args.model,
             dry_run=args.dry_run,
             limit=args.limit,
+            max_workers=args.max_workers,
+            flush_size=args.flush_size,
+            label_cache_path=args.label_cache or None,
+            bulk_size=args.bulk_size,
         )
     except Exception as exc:
         logger.error(f"Миграция завершилась ошибкой: {exc}")
@@ -5,9 +5,11 @@
 """
 
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
+
+import orjson
 
 # Добавляем родительскую директорию в путь для импорта
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -35,8 +37,19 @@ def find_existing_videos(data_dir: Path) -> list:
     return list(videos.values())
 
 
-def migrate_video(registry: VideoRegistry, metadata_fetcher: YouTubeAPIMetadataFetcher, video_info: dict):
-    """Мигрирует одно видео в реестр"""
+def migrate_video(
+    registry: VideoRegistry,
+    metadata_fetcher: YouTubeAPIMetadataFetcher,
+    video_info: dict,
+    prefetched: Optional[dict] = None
+):
+    """
+    Мигрирует одно видео в реестр
+    
+    Args:
+        prefetched: Метаданные из fetch_metadata_batch (video_id -> dict);
+                    при промахе метаданные запрашиваются по одному
+    """
     video_id = video_info["video_id"]
     
     print(f"\n📹 Обработка видео {video_id}...")
@@ -48,8 +61,10 @@ def migrate_video(registry: VideoRegistry, metadata_fetcher: YouTubeAPIMetadataF
     
     # Получаем метаданные через API
     try:
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        metadata_dict = metadata_fetcher.fetch_metadata(url)
+        metadata_dict = (prefetched or {}).get(video_id)
+        if metadata_dict is None:
+            url = f"https://www.youtube.com/watch?v={video_id}"
+            metadata_dict = metadata_fetcher.fetch_metadata(url)
         video_metadata = VideoMetadata(**metadata_dict)
     except Exception as e:
         print(f"  ⚠️ Ошибка получения метаданных: {e}")
@@ -66,23 +81,22 @@ def migrate_video(registry: VideoRegistry, metadata_fetcher: YouTubeAPIMetadataF
     # Добавляем в реестр
     registry.add_video(video_metadata)
     
-    # Сохраняем пути к файлам
-    if Path(video_info["sag_json"]).exists():
-        registry.set_file_path(video_id, "sag_json", video_info["sag_json"])
-    if Path(video_info["sag_md"]).exists():
-        registry.set_file_path(video_id, "sag_md", video_info["sag_md"])
-    if Path(video_info["raw_subtitles"]).exists():
-        registry.set_file_path(video_id, "raw_subtitles", video_info["raw_subtitles"])
+    # Сохраняем пути к существующим файлам
+    registry.set_file_paths(video_id, {
+        file_type: video_info[file_type]
+        for file_type in ("sag_json", "sag_md", "raw_subtitles")
+        if Path(video_info[file_type]).exists()
+    })
     
     # Пытаемся получить информацию о блоках из SAG файла
     blocks_count = 0
     entities_count = 0
     try:
-        with open(video_info["sag_json"], 'r', encoding='utf-8') as f:
-            sag_data = json.load(f)
-            blocks_count = len(sag_data.get("blocks", []))
-            for block in sag_data.get("blocks", []):
-                entities_count += len(block.get("graph_entities", []))
+        # orjson разбирает байты напрямую; блоки и сущности считаются за один проход
+        with open(video_info["sag_json"], 'rb') as f:
+            blocks = orjson.loads(f.read()).get("blocks", [])
+        blocks_count = len(blocks)
+        entities_count = sum(len(block.get("graph_entities", [])) for block in blocks)
     except:
         pass
     
@@ -126,11 +140,16 @@ def main():
     for v in existing_videos:
         print(f"  • {v['video_id']}")
     
-    # Мигрируем каждое видео
+    # Метаданные новых видео — пакетами по 50 id за один запрос к YouTube API
+    new_ids = [v["video_id"] for v in existing_videos if not registry.video_exists(v["video_id"])]
+    prefetched = metadata_fetcher.fetch_metadata_batch(new_ids)
+    
+    # Мигрируем каждое видео; реестр записывается на диск один раз в конце
     migrated = 0
-    for video_info in existing_videos:
-        if migrate_video(registry, metadata_fetcher, video_info):
-            migrated += 1
+    with registry.batch():
+        for video_info in existing_videos:
+            if migrate_video(registry, metadata_fetcher, video_info, prefetched):
+                migrated += 1
     
     # Показываем статистику
     stats = registry.get_statistics()
@@ -6,13 +6,16 @@ YouTube Subtitles Extractor - Упрощенная версия
 """
 
 import os
-import json
+import time
 import argparse
 from pathlib import Path
 from typing import List, Dict, Optional
 import re
 
+import orjson
+
 try:
+    import youtube_transcript_api
     from youtube_transcript_api import YouTubeTranscriptApi
 except ImportError:
     print("[ERROR] Ошибка: Не установлена библиотека youtube-transcript-api")
@@ -23,34 +26,65 @@ except ImportError:
 try:
     import sys
     sys.path.insert(0, str(Path(__file__).parent.parent))
-    from utils.file_utils import create_filename, get_date_paths
+    from utils.file_utils import create_filename, get_date_paths, ensure_dir
     HAS_FILE_UTILS = True
 except ImportError:
     HAS_FILE_UTILS = False
 
+# Шаблоны URL YouTube компилируются один раз при импорте модуля
+_VIDEO_URL_PATTERNS = tuple(re.compile(p) for p in (
+    r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/live\/)([^&\n?#]+)',
+    r'youtube\.com\/watch\?.*v=([^&\n?#]+)',
+    r'youtu\.be\/([^&\n?#]+)',
+    r'youtube\.com\/live\/([^&\n?#]+)'
+))
+_BARE_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# Ошибки youtube-transcript-api, при которых повтор бессмысленен (набор зависит от версии библиотеки)
+_PERMANENT_ERRORS = tuple(
+    getattr(youtube_transcript_api, name)
+    for name in (
+        "TranscriptsDisabled", "NoTranscriptFound", "VideoUnavailable",
+        "InvalidVideoId", "AgeRestricted", "VideoUnplayable",
+    )
+    if hasattr(youtube_transcript_api, name)
+)
+
 class YouTubeSubtitlesExtractor:
     """Класс для извлечения субтитров с YouTube"""
     
     def __init__(self, output_dir: str = "data/subtitles"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Повторы при временных сбоях YouTube (429, сеть) с экспоненциальной задержкой
+        self.max_retries = int(os.getenv("YOUTUBE_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("YOUTUBE_RETRY_BACKOFF_BASE", "2.0"))
+    
+    def _with_retry(self, func, *args):
+        """Вызывает func с повтором при временных ошибках; постоянные ошибки пробрасываются сразу"""
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                return func(*args)
+            except _PERMANENT_ERRORS:
+                raise
+            except Exception as e:
+                if attempt > self.max_retries:
+                    raise
+                delay = min(self.backoff_base ** attempt, 60.0)
+                print(f"[WARNING] Временная ошибка YouTube ({e.__class__.__name__}), "
+                      f"повтор {attempt}/{self.max_retries} через {delay:.1f}s")
+                time.sleep(delay)
     
     def extract_video_id(self, url: str) -> Optional[str]:
         """Извлекает ID видео из URL YouTube"""
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/live\/)([^&\n?#]+)',
-            r'youtube\.com\/watch\?.*v=([^&\n?#]+)',
-            r'youtu\.be\/([^&\n?#]+)',
-            r'youtube\.com\/live\/([^&\n?#]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _VIDEO_URL_PATTERNS:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
         
         # Если URL не распознан, возможно это уже ID
-        if len(url) == 11 and re.match(r'^[A-Za-z0-9_-]{11}$', url):
+        if len(url) == 11 and _BARE_VIDEO_ID_RE.match(url):
             return url
             
         return None
@@ -62,12 +96,12 @@ class YouTubeSubtitlesExtractor:
             api = YouTubeTranscriptApi()
             
             # Получаем список всех доступных субтитров
-            transcript_list = api.list(video_id)
+            transcript_list = self._with_retry(api.list, video_id)
             
             # Пытаемся найти субтитры на нужном языке
             try:
                 transcript = transcript_list.find_transcript([language])
-                subtitles = transcript.fetch()
+                subtitles = self._with_retry(transcript.fetch)
                 print(f"[OK] Получены субтитры на языке: {language}")
                 return subtitles
             except:
@@ -76,7 +110,7 @@ class YouTubeSubtitlesExtractor:
                 # Пытаемся получить любые доступные субтитры
                 try:
                     transcript = transcript_list[0]
-                    subtitles = transcript.fetch()
+                    subtitles = self._with_retry(transcript.fetch)
                     print(f"[OK] Получены субтитры на языке: {transcript.language_code}")
                     return subtitles
                 except:
@@ -113,33 +147,14 @@ class YouTubeSubtitlesExtractor:
             base_filename = create_filename(video_id, title, published_date, ext="").rstrip('.')
             # Получаем путь по датам
             date_path, year, month = get_date_paths(self.output_dir, published_date)
-            date_path.mkdir(parents=True, exist_ok=True)
+            ensure_dir(date_path)
             output_dir = date_path
         else:
             # Старый формат для обратной совместимости
             base_filename = f"{video_id}"
             output_dir = self.output_dir
         
-        # Метаданные
-        total_duration = 0
-        for item in subtitles:
-            if hasattr(item, 'duration'):
-                total_duration += item.duration
-            elif isinstance(item, dict):
-                total_duration += item.get('duration', 0)
-        
-        metadata = {
-            "video_id": video_id,
-            "subtitle_count": len(subtitles),
-            "total_duration": total_duration
-        }
-        
-        saved_files = {}
-        
-        # Сохраняем JSON
-        json_path = output_dir / f"{base_filename}.json"
-        
-        # Конвертируем объекты в словари для JSON
+        # Один проход: приводим элементы (объекты API или dict) к dict
         subtitles_dict = []
         for item in subtitles:
             if hasattr(item, 'text'):
@@ -153,26 +168,30 @@ class YouTubeSubtitlesExtractor:
             else:
                 subtitles_dict.append({'text': str(item), 'start': 0, 'duration': 0})
         
+        # Метаданные
+        total_duration = sum(item.get('duration', 0) for item in subtitles_dict)
+        
+        metadata = {
+            "video_id": video_id,
+            "subtitle_count": len(subtitles),
+            "total_duration": total_duration
+        }
+        
+        saved_files = {}
+        
+        # Сохраняем JSON
+        json_path = output_dir / f"{base_filename}.json"
         json_data = {
             "metadata": metadata,
             "subtitles": subtitles_dict
         }
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+        with open(json_path, 'wb') as f:
+            f.write(orjson.dumps(json_data, option=orjson.OPT_INDENT_2))
         saved_files['json'] = str(json_path)
         
-        # Сохраняем TXT (только текст)
+        # Сохраняем TXT (только текст); join вместо накопления строки через +=
         txt_path = output_dir / f"{base_filename}.txt"
-        text_content = ""
-        for item in subtitles:
-            # Проверяем тип объекта
-            if hasattr(item, 'text'):
-                text_content += item.text + " "
-            elif isinstance(item, dict):
-                text_content += item.get('text', '') + " "
-            else:
-                text_content += str(item) + " "
-        
+        text_content = " ".join(item.get('text', '') for item in subtitles_dict)
         with open(txt_path, 'w', encoding='utf-8') as f:
             f.write(text_content.strip())
         saved_files['txt'] = str(txt_path)
@@ -181,22 +200,9 @@ class YouTubeSubtitlesExtractor:
         srt_path = output_dir / f"{base_filename}.srt"
         srt_lines = []
         
-        for i, item in enumerate(subtitles, 1):
-            # Получаем данные
-            if hasattr(item, 'text'):
-                text = item.text
-                start = item.start
-                duration = item.duration
-            elif isinstance(item, dict):
-                text = item.get('text', '')
-                start = item.get('start', 0)
-                duration = item.get('duration', 0)
-            else:
-                text = str(item)
-                start = 0
-                duration = 0
-            
-            end = start + duration
+        for i, item in enumerate(subtitles_dict, 1):
+            start = item.get('start', 0)
+            end = start + item.get('duration', 0)
             
             # Форматируем время
             start_time = self._seconds_to_srt_time(start)
@@ -205,7 +211,7 @@ class YouTubeSubtitlesExtractor:
             # Добавляем в SRT
             srt_lines.append(f"{i}")
             srt_lines.append(f"{start_time} --> {end_time}")
-            srt_lines.append(text)
+            srt_lines.append(item.get('text', ''))
             srt_lines.append("")
         
         with open(srt_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для разбора YouTube URL в find_sarsekenov_urls
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from scripts.find_sarsekenov_urls import extract_video_id, validate_youtube_url
+
+ID_A = "AAAAAAAAAAA"
+ID_B = "BBBBBBBBBBB"
+
+
+@pytest.mark.parametrize("url, expected", [
+    (f"https://www.youtube.com/watch?v={ID_A}", ID_A),
+    (f"https://youtube.com/watch?list=PL1&v={ID_A}&t=10", ID_A),
+    (f"https://youtu.be/{ID_A}", ID_A),
+    (f"https://www.youtube.com/embed/{ID_A}", ID_A),
+    ("https://example.com/video", None),
+])
+def test_extract_video_id(url, expected):
+    """Тест: id извлекается из всех поддерживаемых форм URL"""
+    assert extract_video_id(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    f"https://youtu.be/{ID_B}?v={ID_A}",
+    f"https://www.youtube.com/embed/{ID_B}?v={ID_A}",
+])
+def test_query_parameter_takes_precedence(url):
+    """Тест: параметр v= приоритетнее id в пути (порядок шаблонов сохранен)"""
+    assert extract_video_id(url) == ID_A
+
+
+@pytest.mark.parametrize("url, expected", [
+    (f"https://www.youtube.com/watch?v={ID_A}", True),
+    (f"http://youtu.be/{ID_A}", True),
+    (f"https://youtube.com/embed/{ID_A}", True),
+    (f"https://www.youtu.be/{ID_A}", False),
+    (f"https://www.youtube.com/watch?list=PL1&v={ID_A}", False),
+    (f"see https://youtu.be/{ID_A}", False),
+])
+def test_validate_youtube_url(url, expected):
+    """Тест: проверка URL по-прежнему привязана к началу строки"""
+    assert validate_youtube_url(url) is expected
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для записи итогов индексации (index_existing_files._write_results)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import orjson
+from scripts.index_existing_files import _write_results
+
+
+def test_results_keep_details_array(tmp_path):
+    """Тест: indexing_results.json содержит счетчики и details из JSONL"""
+    details = [
+        {"file": "a.for_vector.json", "success": True, "indexed": {"documents": 1, "blocks": 3}},
+        {"file": "b.for_vector.json", "success": False, "error": "битый JSON"},
+    ]
+    details_file = tmp_path / "indexing_results.jsonl"
+    details_file.write_bytes(b"".join(orjson.dumps(detail) + b"\n" for detail in details))
+    summary = {"total_files": 2, "successful": 1, "failed": 1, "details_file": str(details_file)}
+    results_file = tmp_path / "indexing_results.json"
+
+    _write_results(results_file, summary, details_file)
+
+    assert orjson.loads(results_file.read_bytes()) == {**summary, "details": details}
+
+
+def test_results_with_no_details(tmp_path):
+    """Тест: пустой JSONL дает пустой массив details"""
+    details_file = tmp_path / "indexing_results.jsonl"
+    details_file.write_bytes(b"")
+    results_file = tmp_path / "indexing_results.json"
+
+    _write_results(results_file, {"total_files": 0}, details_file)
+
+    assert orjson.loads(results_file.read_bytes()) == {"total_files": 0, "details": []}
+
+
+def test_results_with_empty_summary(tmp_path):
+    """Тест: пустой словарь счетчиков тоже дает валидный JSON"""
+    details_file = tmp_path / "indexing_results.jsonl"
+    details_file.write_bytes(orjson.dumps({"file": "a.for_vector.json", "success": True}) + b"\n")
+    results_file = tmp_path / "indexing_results.json"
+
+    _write_results(results_file, {}, details_file)
+
+    assert orjson.loads(results_file.read_bytes()) == {
+        "details": [{"file": "a.for_vector.json", "success": True}]
+    }
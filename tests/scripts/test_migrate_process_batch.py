@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для process_batch из migrate_add_sd_labels: ошибки LLM и флаг повтора
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.migrate_add_sd_labels import SDLabelCache, process_batch
+from text_processor.sd_labeler import SDLabeler
+
+
+class FakeCollection:
+    """Минимальная замена коллекции ChromaDB для collection.get(ids=...)"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def get(self, ids, include):
+        result = {"ids": list(ids), "documents": [self.documents[doc_id] for doc_id in ids]}
+        if "metadatas" in include:
+            result["metadatas"] = [{"source": doc_id} for doc_id in ids]
+        return result
+
+
+class FakeLabeler:
+    """SDLabeler без LLM: блоки из failing падают, как при raise_on_error=True"""
+
+    def __init__(self, failing=(), label=None):
+        self.failing = set(failing)
+        self.label = label or {"sd_level": "BLUE", "complexity_score": 3}
+        self.calls = []
+
+    def label_block(self, block_content, block_id="", raise_on_error=False):
+        self.calls.append(block_id)
+        if block_id in self.failing:
+            if raise_on_error:
+                raise RuntimeError("rate limit")
+            return SDLabeler._default_label()
+        return dict(self.label)
+
+
+def run_batch(labeler, documents, **kwargs):
+    pending_ids, pending_metadatas = [], []
+    counts = process_batch(
+        FakeCollection(documents),
+        labeler,
+        list(documents),
+        pending_ids,
+        pending_metadatas,
+        max_workers=2,
+        **kwargs,
+    )
+    return counts, dict(zip(pending_ids, pending_metadatas))
+
+
+def test_llm_error_marks_block_for_retry():
+    """Тест: ошибка LLM дает fallback-разметку с флагом повтора"""
+    labeler = FakeLabeler(failing={"b"})
+
+    (success, errors), metas = run_batch(labeler, {"a": "текст A", "b": "текст B"})
+
+    assert (success, errors) == (1, 1)
+    assert metas["a"]["sd_level"] == "BLUE"
+    assert metas["a"]["sd_labeled_by"] == "migrate_v4"
+    assert "sd_labeling_needs_retry" not in metas["a"]
+    assert metas["b"]["sd_labeled_by"] == "migrate_v4_fallback"
+    assert metas["b"]["sd_labeling_needs_retry"] is True
+
+
+def test_llm_answer_equal_to_default_is_not_an_error():
+    """Тест: настоящий ответ LLM, совпадающий с разметкой по умолчанию, — успех"""
+    labeler = FakeLabeler(label=SDLabeler._default_label())
+
+    (success, errors), metas = run_batch(labeler, {"a": "текст A"})
+
+    assert (success, errors) == (1, 0)
+    assert metas["a"]["sd_labeled_by"] == "migrate_v4"
+
+
+def test_failed_blocks_are_not_cached(tmp_path):
+    """Тест: в кэш попадает только успешная разметка"""
+    cache = SDLabelCache(str(tmp_path / "sd_labels.sqlite"), model="test")
+    try:
+        run_batch(FakeLabeler(failing={"b"}), {"a": "текст A", "b": "текст B"}, label_cache=cache)
+        labeler = FakeLabeler()
+
+        (success, errors), _ = run_batch(labeler, {"a": "текст A", "b": "текст B"}, label_cache=cache)
+
+        assert (success, errors) == (2, 0)
+        assert labeler.calls == ["b"]
+    finally:
+        cache.close()
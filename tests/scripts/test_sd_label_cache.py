@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для кэша SD-разметки (SDLabelCache из migrate_add_sd_labels)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import sqlite3
+
+import pytest
+from scripts.migrate_add_sd_labels import SDLabelCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    label_cache = SDLabelCache(str(tmp_path / "sd_labels.sqlite"), model="gpt-4o-mini")
+    yield label_cache
+    label_cache.close()
+
+
+def test_put_and_get_roundtrip(cache):
+    """Тест: сохраненная разметка возвращается без изменений"""
+    key = cache.key("текст блока")
+    data = {"sd_level": "GREEN", "complexity_score": 4, "requires_prior_concepts": False}
+
+    cache.put_many({key: data})
+
+    assert cache.get_many([key, cache.key("другой блок")]) == {key: data}
+    assert cache.hits == 1
+
+
+def test_get_many_handles_more_keys_than_sqlite_limit(cache):
+    """Тест: поиск по большому числу ключей разбивается на части"""
+    # Старые сборки SQLite допускают лишь 999 параметров в запросе
+    cache._conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    keys = [cache.key(f"блок {i}") for i in range(2500)]
+    stored = {key: {"sd_level": "BLUE"} for key in keys[::7]}
+    cache.put_many(stored)
+
+    assert cache.get_many(keys) == stored
+    assert cache.get_many([]) == {}
+
+
+def test_key_depends_on_model(tmp_path):
+    """Тест: разметка другой модели не переиспользуется"""
+    path = str(tmp_path / "sd_labels.sqlite")
+    first = SDLabelCache(path, model="gpt-4o-mini")
+    first.put_many({first.key("блок"): {"sd_level": "RED"}})
+    first.close()
+
+    second = SDLabelCache(path, model="gpt-4o")
+    try:
+        assert second.get_many([second.key("блок")]) == {}
+    finally:
+        second.close()
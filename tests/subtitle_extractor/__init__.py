@@ -0,0 +1 @@
+"""Tests for subtitle_extractor."""
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для повторов запросов к YouTube (YouTubeSubtitlesExtractor._with_retry)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from subtitle_extractor import get_subtitles
+from subtitle_extractor.get_subtitles import YouTubeSubtitlesExtractor
+
+
+class Flaky:
+    """Функция, которая падает заданное число раз, затем возвращает результат"""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("temporary")
+        return args
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(get_subtitles.time, "sleep", delays.append)
+    return delays
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    monkeypatch.setenv("YOUTUBE_MAX_RETRIES", "3")
+    monkeypatch.setenv("YOUTUBE_RETRY_BACKOFF_BASE", "2.0")
+    return YouTubeSubtitlesExtractor(output_dir=str(tmp_path))
+
+
+def test_retry_succeeds_after_transient_errors(extractor, sleeps):
+    """Тест: временные ошибки повторяются с экспоненциальной задержкой"""
+    func = Flaky(failures=2)
+
+    assert extractor._with_retry(func, "video", "ru") == ("video", "ru")
+    assert func.calls == 3
+    assert sleeps == [2.0, 4.0]
+
+
+def test_retry_gives_up_after_max_retries(extractor, sleeps):
+    """Тест: после max_retries повторов ошибка пробрасывается"""
+    func = Flaky(failures=10)
+
+    with pytest.raises(ConnectionError):
+        extractor._with_retry(func)
+    assert func.calls == extractor.max_retries + 1
+    assert len(sleeps) == extractor.max_retries
+
+
+def test_retry_delay_is_capped(extractor, sleeps):
+    """Тест: задержка не превышает 60 секунд"""
+    extractor.backoff_base = 100.0
+
+    extractor._with_retry(Flaky(failures=1))
+
+    assert sleeps == [60.0]
+
+
+@pytest.mark.skipif(not get_subtitles._PERMANENT_ERRORS, reason="нет постоянных ошибок в этой версии API")
+def test_permanent_errors_are_not_retried(extractor, sleeps):
+    """Тест: постоянные ошибки (субтитры отключены и т.п.) пробрасываются сразу"""
+    error = get_subtitles._PERMANENT_ERRORS[0]
+
+    def func():
+        raise error("video1234567")
+
+    with pytest.raises(error):
+        extractor._with_retry(func)
+    assert sleeps == []
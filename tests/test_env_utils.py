@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для ручного разбора строк .env (env_utils._ENV_RE)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from env_utils import _ENV_RE
+
+
+def parse(line):
+    match = _ENV_RE.match(line)
+    if not match:
+        return None
+    return match.group(1), match.group(2) or match.group(3) or match.group(4) or ""
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("OPENAI_API_KEY=sk-test", ("OPENAI_API_KEY", "sk-test")),
+    ("  KEY = value  ", ("KEY", "value")),
+    ('KEY="quoted value"', ("KEY", "quoted value")),
+    ("KEY='single # not comment'", ("KEY", "single # not comment")),
+    ("KEY=a=b", ("KEY", "a=b")),
+    ("KEY=", ("KEY", "")),
+])
+def test_env_line_parsed(line, expected):
+    """Тест: строки KEY=value разбираются в пару ключ-значение"""
+    assert parse(line) == expected
+
+
+@pytest.mark.parametrize("line", ["", "   ", "# KEY=value", "=value", "just text"])
+def test_non_assignment_lines_ignored(line):
+    """Тест: пустые строки, комментарии и строки без ключа не совпадают"""
+    assert parse(line) is None
+
+
+def test_load_env_falls_through_to_next_candidate(tmp_path, monkeypatch):
+    """Тест: если dotenv не загрузил первый найденный .env, пробуется следующий"""
+    import env_utils
+
+    work_dir = tmp_path / "work"
+    package_dir = tmp_path / "package"
+    work_dir.mkdir()
+    package_dir.mkdir()
+    (work_dir / ".env").write_text("", encoding="utf-8")
+    (package_dir / ".env").write_text("FALLTHROUGH_KEY=value\n", encoding="utf-8")
+
+    calls = []
+
+    def fake_load_dotenv(dotenv_path=None, override=False):
+        calls.append(dotenv_path)
+        # Пустой файл python-dotenv считает незагруженным
+        return dotenv_path is not None and Path(dotenv_path).read_text(encoding="utf-8") != ""
+
+    monkeypatch.chdir(work_dir)
+    monkeypatch.setattr(env_utils, "__file__", str(package_dir / "env_utils.py"))
+    monkeypatch.setattr(env_utils, "load_dotenv", fake_load_dotenv)
+
+    env_utils.load_env(force=True)
+
+    assert calls == [str((work_dir / ".env").resolve()), str((package_dir / ".env").resolve())]
@@ -0,0 +1 @@
+"""Tests for text_processor."""
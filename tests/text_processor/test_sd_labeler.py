@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для пакетной SD-разметки (SDLabeler.label_blocks_bulk)
+"""
+
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from text_processor.sd_labeler import SDLabeler
+
+
+class FakeCompletions:
+    """Замена client.chat.completions: отдаёт заранее заданный ответ"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if isinstance(self.content, Exception):
+            raise self.content
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_labeler(monkeypatch, content):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    labeler = SDLabeler()
+    completions = FakeCompletions(content)
+    labeler.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return labeler, completions
+
+
+def bulk_response(*items):
+    return json.dumps({"results": list(items)}, ensure_ascii=False)
+
+
+def test_bulk_labels_known_blocks_in_one_request(monkeypatch):
+    """Тест: все блоки размечаются одним запросом"""
+    labeler, completions = make_labeler(
+        monkeypatch,
+        bulk_response(
+            {"id": "a", "sd_level": "GREEN", "complexity_score": 4},
+            {"id": "b", "sd_level": "BLUE", "complexity_score": 2},
+        ),
+    )
+
+    labeled = labeler.label_blocks_bulk([("a", "текст A"), ("b", "текст B")])
+
+    assert len(completions.calls) == 1
+    assert labeled == {
+        "a": {"sd_level": "GREEN", "complexity_score": 4},
+        "b": {"sd_level": "BLUE", "complexity_score": 2},
+    }
+
+
+@pytest.mark.parametrize("sd_level", ["UNKNOWN", "green", "", None, 5])
+def test_bulk_drops_unknown_sd_level(monkeypatch, sd_level):
+    """Тест: блок с неизвестным sd_level не попадает в результат"""
+    labeler, _ = make_labeler(
+        monkeypatch,
+        bulk_response(
+            {"id": "a", "sd_level": "GREEN"},
+            {"id": "b", "sd_level": sd_level},
+        ),
+    )
+
+    labeled = labeler.label_blocks_bulk([("a", "текст A"), ("b", "текст B")])
+
+    assert set(labeled) == {"a"}
+
+
+def test_bulk_ignores_foreign_and_missing_ids(monkeypatch):
+    """Тест: id, которых не было в запросе, отбрасываются; пропущенные не возвращаются"""
+    labeler, _ = make_labeler(
+        monkeypatch,
+        bulk_response({"id": "zzz", "sd_level": "RED"}, "не объект"),
+    )
+
+    assert labeler.label_blocks_bulk([("a", "текст A")]) == {}
+
+
+@pytest.mark.parametrize("content", ["не JSON", RuntimeError("rate limit")])
+def test_bulk_error_returns_empty(monkeypatch, content):
+    """Тест: ошибка запроса или разбора даёт пустой словарь (fallback на label_block)"""
+    labeler, _ = make_labeler(monkeypatch, content)
+
+    assert labeler.label_blocks_bulk([("a", "текст A")]) == {}
+
+
+def test_bulk_empty_input_skips_request(monkeypatch):
+    """Тест: пустой список блоков не вызывает LLM"""
+    labeler, completions = make_labeler(monkeypatch, bulk_response())
+
+    assert labeler.label_blocks_bulk([]) == {}
+    assert completions.calls == []
+
+
+def test_label_block_returns_default_on_error(monkeypatch):
+    """Тест: по умолчанию ошибка LLM заменяется разметкой по умолчанию"""
+    labeler, _ = make_labeler(monkeypatch, RuntimeError("rate limit"))
+
+    assert labeler.label_block("текст", block_id="a") == SDLabeler._default_label()
+
+
+@pytest.mark.parametrize("content", ["не JSON", RuntimeError("rate limit")])
+def test_label_block_raise_on_error(monkeypatch, content):
+    """Тест: raise_on_error=True пробрасывает ошибку вызывающему коду"""
+    labeler, _ = make_labeler(monkeypatch, content)
+
+    with pytest.raises(Exception):
+        labeler.label_block("текст", block_id="a", raise_on_error=True)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для ensure_dir (создание директорий по датам)
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils.file_utils import ensure_dir
+
+
+def test_ensure_dir_creates_nested_directory(tmp_path):
+    """Тест: директория создается вместе с родителями"""
+    target = tmp_path / "2024" / "03"
+
+    assert ensure_dir(target) == target
+    assert target.is_dir()
+
+
+def test_ensure_dir_existing_directory(tmp_path):
+    """Тест: повторный вызов для существующей директории не падает"""
+    target = ensure_dir(tmp_path / "2024" / "03")
+    (target / "file.json").write_text("{}", encoding="utf-8")
+
+    assert ensure_dir(target) == target
+    assert (target / "file.json").exists()
+
+
+def test_ensure_dir_recreates_deleted_directory(tmp_path):
+    """Тест: директория, удаленная во время работы процесса, создается заново"""
+    target = ensure_dir(tmp_path / "2024" / "03")
+    shutil.rmtree(tmp_path / "2024")
+
+    ensure_dir(target)
+
+    assert target.is_dir()
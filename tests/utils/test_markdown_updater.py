@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для MarkdownUpdater (колонки статуса по снимку реестра)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils.markdown_updater import MarkdownUpdater
+from utils.video_registry import ProcessingRecord, VideoMetadata, VideoRegistry
+
+HEADER = "| № | Дата публикации | Название | Плейлист | Просмотры | Длительность | Ссылка |"
+SEPARATOR = "|---|---|---|---|---|--------|--------|"
+
+
+def make_row(number, video_id):
+    return f"| {number} | 01.01.2024 | Видео {number} | - | 10 | 10:00 | https://youtube.com/watch?v={video_id} |"
+
+
+def add_video(registry, video_id):
+    registry.add_video(VideoMetadata(
+        video_id=video_id,
+        title=video_id,
+        channel="test",
+        published_date="2024-01-01",
+        duration_seconds=600,
+        url=f"https://youtube.com/watch?v={video_id}",
+    ))
+
+
+def record(error_message=None):
+    return ProcessingRecord(
+        processed_at="2024-03-05T10:00:00",
+        pipeline_version="test",
+        stage_completed="sag",
+        blocks_created=3,
+        entities_extracted=5,
+        processing_time_seconds=1.0,
+        api_cost_estimate=0.01,
+        error_message=error_message,
+    )
+
+
+def test_status_columns_follow_registry(tmp_path):
+    """Тест: статусы и дата обработки берутся из реестра"""
+    registry = VideoRegistry(str(tmp_path / "registry.json"))
+    for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"):
+        add_video(registry, video_id)
+    registry.add_processing_record("aaaaaaaaaaa", record())
+    registry.add_processing_record("bbbbbbbbbbb", record(error_message="boom"))
+
+    markdown = tmp_path / "videos.md"
+    markdown.write_text("\n".join([
+        HEADER,
+        SEPARATOR,
+        make_row(1, "aaaaaaaaaaa"),
+        make_row(2, "bbbbbbbbbbb"),
+        make_row(3, "ccccccccccc"),
+        make_row(4, "ddddddddddd"),
+    ]), encoding="utf-8")
+
+    assert MarkdownUpdater(str(markdown), registry=registry).update_status_columns()
+
+    lines = markdown.read_text(encoding="utf-8").split("\n")
+    assert "| Статус | Дата обработки | Ссылка |" in lines[0]
+    assert "| [x] | 05.03.2024 |" in lines[2]
+    assert "| [!] |  |" in lines[3]
+    assert "| [ ] |  |" in lines[4]
+    assert "| [ ] |  |" in lines[5]
+
+
+def test_status_snapshot_is_detached_from_registry(tmp_path):
+    """Тест: снимок статусов не меняется при последующих мутациях реестра"""
+    registry = VideoRegistry(str(tmp_path / "registry.json"))
+    add_video(registry, "aaaaaaaaaaa")
+
+    snapshot = registry.get_status_snapshot()
+    registry.add_processing_record("aaaaaaaaaaa", record())
+    add_video(registry, "bbbbbbbbbbb")
+
+    assert snapshot == {"aaaaaaaaaaa": ("pending", "")}
+    assert registry.get_status_snapshot()["aaaaaaaaaaa"] == ("processed", "2024-03-05T10:00:00")
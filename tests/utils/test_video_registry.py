@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для VideoRegistry: отложенная запись (batch/flush) и инкрементальные агрегаты
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import orjson
+import pytest
+from utils.video_registry import ProcessingRecord, VideoMetadata, VideoRegistry
+
+
+def metadata(video_id):
+    return VideoMetadata(
+        video_id=video_id,
+        title=video_id,
+        channel="test",
+        published_date="2024-01-01",
+        duration_seconds=600,
+        url=f"https://youtube.com/watch?v={video_id}",
+    )
+
+
+def record(blocks=3, entities=5, cost=0.25, error_message=None):
+    return ProcessingRecord(
+        processed_at="2024-03-05T10:00:00",
+        pipeline_version="test",
+        stage_completed="sag",
+        blocks_created=blocks,
+        entities_extracted=entities,
+        processing_time_seconds=1.0,
+        api_cost_estimate=cost,
+        error_message=error_message,
+    )
+
+
+def read_file(path):
+    return orjson.loads(Path(path).read_bytes())
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return tmp_path / "registry.json"
+
+
+def test_aggregates_follow_mutations(registry_path):
+    """Тест: счетчики и суммы обновляются инкрементально и совпадают с пересчетом"""
+    registry = VideoRegistry(str(registry_path))
+    for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"):
+        registry.add_video(metadata(video_id))
+    registry.get_statistics()  # агрегаты посчитаны — дальше только инкременты
+
+    registry.add_processing_record("aaaaaaaaaaa", record(blocks=4, entities=6, cost=0.5))
+    registry.add_processing_record("bbbbbbbbbbb", record(blocks=0, entities=0, cost=0.1, error_message="boom"))
+    registry.update_status("ccccccccccc", "processed")
+
+    stats = registry.get_statistics()
+    assert stats == {
+        "total_videos": 3,
+        "processed": 2,
+        "failed": 1,
+        "pending": 0,
+        "total_blocks": 4,
+        "total_entities": 6,
+        "total_api_cost": 0.6,
+        "avg_blocks_per_video": 2.0,
+    }
+    # Счетчики в файле берутся из тех же агрегатов
+    data = read_file(registry_path)
+    assert (data["total_videos"], data["processed"], data["failed"], data["pending"]) == (3, 2, 1, 0)
+    # Свежий экземпляр считает агрегаты одним проходом по файлу
+    assert VideoRegistry(str(registry_path)).get_statistics() == stats
+
+
+def test_empty_registry_statistics(registry_path):
+    """Тест: статистика пустого реестра"""
+    assert VideoRegistry(str(registry_path)).get_statistics() == {"total": 0}
+
+
+def test_batch_defers_write_until_exit(registry_path):
+    """Тест: внутри batch() файл не пишется, при выходе — один раз"""
+    registry = VideoRegistry(str(registry_path))
+
+    with registry.batch():
+        registry.add_video(metadata("aaaaaaaaaaa"))
+        registry.add_processing_record("aaaaaaaaaaa", record())
+        assert not registry_path.exists()
+
+    data = read_file(registry_path)
+    assert data["videos"]["aaaaaaaaaaa"]["status"] == "processed"
+    assert (data["total_videos"], data["processed"]) == (1, 1)
+
+
+def test_nested_batch_and_explicit_flush(registry_path):
+    """Тест: вложенный batch() не пишет файл, flush() сбрасывает накопленное"""
+    registry = VideoRegistry(str(registry_path))
+
+    with registry.batch():
+        with registry.batch():
+            registry.add_video(metadata("aaaaaaaaaaa"))
+        assert not registry_path.exists()
+
+        registry.flush()
+        assert read_file(registry_path)["total_videos"] == 1
+
+        registry.add_video(metadata("bbbbbbbbbbb"))
+        assert read_file(registry_path)["total_videos"] == 1
+
+    assert read_file(registry_path)["total_videos"] == 2
+
+
+def test_save_outside_batch_writes_immediately(registry_path):
+    """Тест: без batch() каждая мутация сохраняется сразу"""
+    registry = VideoRegistry(str(registry_path))
+
+    registry.add_video(metadata("aaaaaaaaaaa"))
+
+    assert read_file(registry_path)["pending"] == 1
+
+
+def test_processed_ids_and_duplicates(registry_path):
+    """Тест: повторное добавление отклоняется, снимок обработанных id корректен"""
+    registry = VideoRegistry(str(registry_path))
+    assert registry.add_video(metadata("aaaaaaaaaaa")) is True
+    assert registry.add_video(metadata("aaaaaaaaaaa")) is False
+    registry.add_video(metadata("bbbbbbbbbbb"))
+    registry.add_processing_record("bbbbbbbbbbb", record())
+
+    assert registry.get_processed_ids() == frozenset({"bbbbbbbbbbb"})
+    assert registry.get_pending_videos() == ["aaaaaaaaaaa"]
+
+
+def test_set_file_paths_unknown_video(registry_path):
+    """Тест: пути к файлам для неизвестного видео — ошибка"""
+    registry = VideoRegistry(str(registry_path))
+    registry.add_video(metadata("aaaaaaaaaaa"))
+    registry.set_file_paths("aaaaaaaaaaa", {"sag": "a.json", "review": "a.md"})
+
+    assert registry.get_video("aaaaaaaaaaa")["files"] == {"sag": "a.json", "review": "a.md"}
+    with pytest.raises(ValueError):
+        registry.set_file_paths("zzzzzzzzzzz", {"sag": "z.json"})
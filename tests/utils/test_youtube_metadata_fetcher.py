@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для пакетного получения метаданных (YouTubeAPIMetadataFetcher.fetch_metadata_batch)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from utils.youtube_metadata_fetcher import YouTubeAPIMetadataFetcher
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeYouTube:
+    """Замена клиента YouTube Data API: videos().list(...).execute()"""
+
+    def __init__(self, failing_chunks=()):
+        self.requests = []
+        self.failing_chunks = set(failing_chunks)
+
+    def videos(self):
+        return self
+
+    def list(self, part, id):
+        ids = id.split(",")
+        self.requests.append(ids)
+        if len(self.requests) - 1 in self.failing_chunks:
+            return FakeRequest(RuntimeError("quota exceeded"))
+        items = [
+            {
+                "id": video_id,
+                "snippet": {"title": f"title {video_id}", "channelTitle": "channel"},
+                "contentDetails": {"duration": "PT1H2M3S"},
+            }
+            for video_id in ids
+            if not video_id.startswith("missing")
+        ]
+        return FakeRequest({"items": items})
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    monkeypatch.delenv("YOUTUBE_API_KEY", raising=False)
+    fetcher = YouTubeAPIMetadataFetcher()
+    # Проверка субтитров ходит в сеть — в тестах подменяется
+    monkeypatch.setattr(fetcher, "_check_subtitles", lambda video_id: True)
+    monkeypatch.setattr(fetcher, "_get_subtitle_type", lambda video_id: "manual")
+    return fetcher
+
+
+def test_batch_requests_up_to_50_ids(fetcher):
+    """Тест: один запрос videos.list на каждые 50 id"""
+    fetcher.youtube = FakeYouTube()
+    video_ids = [f"vid{i:08d}" for i in range(120)]
+
+    result = fetcher.fetch_metadata_batch(video_ids)
+
+    assert [len(ids) for ids in fetcher.youtube.requests] == [50, 50, 20]
+    assert list(result) == video_ids
+    assert result["vid00000000"]["duration_seconds"] == 3723
+    assert result["vid00000000"]["title"] == "title vid00000000"
+    assert result["vid00000000"]["url"] == "https://www.youtube.com/watch?v=vid00000000"
+
+
+def test_batch_skips_missing_and_failed_chunks(fetcher):
+    """Тест: видео, которых нет в ответе или из упавшего запроса, не попадают в результат"""
+    fetcher.youtube = FakeYouTube(failing_chunks={1})
+    video_ids = [f"vid{i:08d}" for i in range(49)] + ["missing0001"] + ["late0000001"]
+
+    result = fetcher.fetch_metadata_batch(video_ids)
+
+    assert len(fetcher.youtube.requests) == 2
+    assert set(result) == {f"vid{i:08d}" for i in range(49)}
+
+
+def test_batch_without_api_returns_empty(fetcher):
+    """Тест: без API-клиента пакетный режим ничего не возвращает"""
+    assert fetcher.youtube is None
+    assert fetcher.fetch_metadata_batch(["vid00000000"]) == {}
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для постоянного кэша эмбеддингов (CachedEmbeddingService)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pytest
+from vector_db.embedding_cache import CachedEmbeddingService
+
+
+class FakeEmbeddingService:
+    """Детерминированная замена EmbeddingService: float32-векторы, как у модели"""
+
+    model_name = "fake-model"
+    backend = "torch"
+    embedding_dim = 8
+
+    def __init__(self):
+        self.calls = []
+
+    def create_embeddings_batch(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        result = []
+        for text in texts:
+            if not text or not text.strip():
+                result.append([0.0] * self.embedding_dim)
+                continue
+            rng = np.random.default_rng(abs(hash(text.strip())) % (2 ** 32))
+            result.append(rng.standard_normal(self.embedding_dim).astype(np.float32).tolist())
+        return result
+
+    def warmup(self):
+        pass
+
+
+@pytest.fixture
+def service():
+    return FakeEmbeddingService()
+
+
+@pytest.fixture
+def cache(service, tmp_path):
+    cached = CachedEmbeddingService(service, cache_path=str(tmp_path / "embeddings.sqlite"))
+    yield cached
+    cached.close()
+
+
+def test_miss_returns_service_vectors_unchanged(cache, service):
+    """Тест: при промахе векторы совпадают с выводом сервиса"""
+    texts = ["первый блок", "второй блок"]
+    expected = FakeEmbeddingService().create_embeddings_batch(texts)
+
+    assert cache.create_embeddings_batch(texts) == expected
+    assert cache.stats() == {"hits": 0, "misses": 2}
+
+
+def test_hit_returns_same_vectors_without_service_call(cache, service):
+    """Тест: при попадании векторы идентичны исходным, сервис не вызывается"""
+    texts = ["первый блок", "второй блок"]
+    first = cache.create_embeddings_batch(texts)
+    calls_before = len(service.calls)
+
+    second = cache.create_embeddings_batch(texts)
+
+    assert second == first
+    assert second == FakeEmbeddingService().create_embeddings_batch(texts)
+    assert len(service.calls) == calls_before
+    assert cache.stats() == {"hits": 2, "misses": 2}
+
+
+def test_cache_persists_between_instances(service, tmp_path):
+    """Тест: кэш переживает пересоздание сервиса (файл SQLite)"""
+    path = str(tmp_path / "embeddings.sqlite")
+    first = CachedEmbeddingService(service, cache_path=path)
+    vectors = first.create_embeddings_batch(["блок"])
+    first.close()
+
+    other_service = FakeEmbeddingService()
+    second = CachedEmbeddingService(other_service, cache_path=path)
+    try:
+        assert second.create_embeddings_batch(["блок"]) == vectors
+        assert other_service.calls == []
+    finally:
+        second.close()
+
+
+def test_duplicates_and_empty_texts(cache, service):
+    """Тест: дубликаты считаются один раз, пустые тексты получают нулевой вектор"""
+    result = cache.create_embeddings_batch(["блок", "  ", "блок"])
+
+    assert service.calls == [["блок"]]
+    assert result[0] == result[2]
+    assert result[1] == [0.0] * service.embedding_dim
+
+
+def test_backend_is_part_of_cache_key(service, tmp_path):
+    """Тест: векторы ONNX-бэкенда кэшируются отдельно от torch"""
+    path = str(tmp_path / "embeddings.sqlite")
+    torch_cache = CachedEmbeddingService(service, cache_path=path)
+    torch_cache.create_embeddings_batch(["блок"])
+    torch_cache.close()
+
+    onnx_service = FakeEmbeddingService()
+    onnx_service.backend = "onnx:onnx/model_quint8_avx2.onnx"
+    onnx_cache = CachedEmbeddingService(onnx_service, cache_path=path)
+    try:
+        onnx_cache.create_embeddings_batch(["блок"])
+        assert onnx_service.calls == [["блок"]]
+    finally:
+        onnx_cache.close()
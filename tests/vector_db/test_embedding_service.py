@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для общего на процесс EmbeddingService (get_embedding_service)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from vector_db import embedding_service
+from vector_db.embedding_service import get_embedding_service
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Подменяет EmbeddingService: модель не загружается, фиксируются параметры"""
+    instances = []
+
+    class FakeEmbeddingService:
+        def __init__(self, model=None, device=None, backend=None):
+            instances.append((model, device, backend))
+
+    monkeypatch.setattr(embedding_service, "EmbeddingService", FakeEmbeddingService)
+    get_embedding_service.cache_clear()
+    yield instances
+    get_embedding_service.cache_clear()
+
+
+def test_same_parameters_reuse_service(created):
+    """Тест: повторный вызов с теми же параметрами не загружает модель заново"""
+    first = get_embedding_service(model="model-a")
+
+    assert get_embedding_service(model="model-a") is first
+    assert created == [("model-a", None, None)]
+
+
+def test_different_parameters_create_new_service(created):
+    """Тест: другая модель или бэкенд — отдельный экземпляр"""
+    first = get_embedding_service(model="model-a")
+
+    assert get_embedding_service(model="model-b") is not first
+    assert get_embedding_service(model="model-a", backend="onnx") is not first
+    assert len(created) == 3
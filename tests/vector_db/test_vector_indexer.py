@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для векторизации всех уровней SAG v2.0 одним вызовом модели
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from vector_db.vector_indexer import VectorIndexer
+
+SAG_DATA = {
+    "document_title": "Заголовок",
+    "document_summary": "Краткое содержание",
+    "document_metadata": {"video_id": "vid00000001"},
+    "blocks": [
+        {"block_id": "vid00000001_001", "title": "Блок 1", "content": "текст 1", "graph_entities": ["осознанность"]},
+        {"block_id": "vid00000001_002", "title": "Блок 2", "content": "текст 2", "graph_entities": ["осознанность", "страх"]},
+    ],
+    "knowledge_graph": {
+        "nodes": [{"id": "n1", "name": "Осознанность", "node_type": "CONCEPT"}],
+        "edges": [],
+    },
+}
+
+
+class FakeEmbeddingService:
+    """Вектор — номер текста в порядке вызова: видно, как векторы раскладываются по уровням"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        # Вызов падает, если среди текстов есть содержащий fail_on
+        self.fail_on = fail_on
+
+    def create_embeddings_batch(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        if self.fail_on and any(self.fail_on in text for text in texts):
+            raise RuntimeError("CUDA out of memory")
+        return [[float(i)] for i in range(len(texts))]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.added = []
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.added.append((list(ids), list(embeddings)))
+
+
+class FakeDBManager:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, level):
+        return self.collections.setdefault(level, FakeCollection())
+
+
+@pytest.fixture
+def service():
+    return FakeEmbeddingService()
+
+
+@pytest.fixture
+def indexer(service):
+    return VectorIndexer(FakeDBManager(), service, batch_size=2)
+
+
+def test_embed_sag_dict_uses_one_model_call(indexer, service):
+    """Тест: тексты всех уровней векторизуются одним вызовом и раскладываются по уровням"""
+    embedded = indexer.embed_sag_dict(SAG_DATA)
+
+    assert len(service.calls) == 1
+    assert list(embedded) == ["documents", "blocks", "graph_entities", "knowledge_graph"]
+    vectors = [vector for _, level_vectors in embedded.values() for vector in level_vectors]
+    assert vectors == [[float(i)] for i in range(len(service.calls[0]))]
+    for (ids, texts, metadatas), level_vectors in embedded.values():
+        assert len(ids) == len(texts) == len(metadatas) == len(level_vectors)
+    assert embedded["blocks"][0][0] == ["vid00000001_001", "vid00000001_002"]
+    assert indexer.db_manager.collections == {}
+
+
+def test_embed_sag_dict_respects_index_levels(indexer):
+    """Тест: векторизуются только запрошенные уровни"""
+    assert list(indexer.embed_sag_dict(SAG_DATA, ["blocks"])) == ["blocks"]
+
+
+def test_index_sag_dict_matches_embed_then_write(indexer, service):
+    """Тест: без embedded результат тот же, что у embed_sag_dict + запись"""
+    results = indexer.index_sag_dict(SAG_DATA)
+
+    assert len(service.calls) == 1
+    assert results["indexed"] == {"documents": 1, "blocks": 2, "graph_entities": 2, "knowledge_graph": 1}
+    assert sum(len(ids) for ids, _ in indexer.db_manager.collections["graph_entities"].added) == 2
+
+
+def test_combined_failure_falls_back_to_levels(service):
+    """Тест: при ошибке общего вызова теряется только уровень, который не векторизуется"""
+    failing = FakeEmbeddingService(fail_on="Граф-сущность")
+    indexer = VectorIndexer(FakeDBManager(), failing, batch_size=2)
+
+    results = indexer.index_sag_dict(SAG_DATA)
+
+    # Общий вызов + по одному на каждый из четырех уровней
+    assert len(failing.calls) == 5
+    assert results["success"] is True
+    assert results["indexed"] == {"documents": 1, "blocks": 2, "graph_entities": 0, "knowledge_graph": 1}
+
+
+def test_index_sag_dict_writes_precomputed_embeddings(indexer, service):
+    """Тест: готовый результат embed_sag_dict записывается без повторной векторизации"""
+    embedded = VectorIndexer(FakeDBManager(), FakeEmbeddingService()).embed_sag_dict(SAG_DATA)
+
+    results = indexer.index_sag_dict({}, source="file.json", embedded=embedded)
+
+    assert service.calls == []
+    assert results["success"] is True
+    assert results["indexed"] == {"documents": 1, "blocks": 2, "graph_entities": 2, "knowledge_graph": 1}
+    blocks = indexer.db_manager.collections["blocks"].added
+    assert blocks == [(["vid00000001_001", "vid00000001_002"], embedded["blocks"][1])]
@@ -41,6 +41,7 @@ from .extractors import (
     CaseStudyExtractor,
     PrerequisiteExtractor
 )
+from .validators import TerminologyValidator
 
 
 def _hms(seconds: Optional[float]) -> Optional[str]:
@@ -78,15 +79,23 @@ class SarsekenovProcessor:
             model=models_config.get('safety', 'gpt-4o-mini')
         ) if sag_config.get('use_safety_extractor', True) else None
         
+        # Один валидатор терминологии на оба экстрактора (как в KnowledgeGraphBuilder):
+        # JSON-словари, MorphAnalyzer и индекс лемм загружаются один раз
+        use_causal = sag_config.get('use_causal_chain_extractor', True)
+        use_hierarchy = sag_config.get('use_concept_hierarchy_extractor', True)
+        terminology_validator = TerminologyValidator() if (use_causal or use_hierarchy) else None
+        
         self.causal_extractor = CausalChainExtractor(
+            terminology_validator=terminology_validator,
             llm_client=self.client,
             use_llm=True
-        ) if sag_config.get('use_causal_chain_extractor', True) else None
+        ) if use_causal else None
         
         self.hierarchy_extractor = ConceptHierarchyExtractor(
+            terminology_validator=terminology_validator,
             llm_client=self.client,
             use_llm=True
-        ) if sag_config.get('use_concept_hierarchy_extractor', True) else None
+        ) if use_hierarchy else None
         
         self.case_extractor = CaseStudyExtractor(
             client=self.client,
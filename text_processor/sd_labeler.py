@@ -8,12 +8,15 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence, Tuple
 
 from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
+# Уровни СД из промпта (порядок — от базового к высшему)
+SD_LEVELS = ("BEIGE", "PURPLE", "RED", "BLUE", "ORANGE", "GREEN", "YELLOW", "TURQUOISE")
+
 
 SD_LABELER_SYSTEM_PROMPT = """
 Ты - эксперт по теории Спиральной Динамики Клэра Грейвза.
@@ -48,6 +51,15 @@ emotional_tone: validating / challenging / educational / neutral / grounding
 complexity_score: 1 (очень просто) - 10 (требует глубокой подготовки)
 """
 
+SD_LABELER_BULK_INSTRUCTION = """
+РЕЖИМ НЕСКОЛЬКИХ БЛОКОВ: тебе даны несколько блоков, у каждого свой id.
+Размечай каждый блок независимо от остальных.
+
+Верни ТОЛЬКО JSON-объект вида:
+{"results": [{"id": "<id блока>", "sd_level": "...", "sd_secondary": "...", "complexity_score": 4,
+  "emotional_tone": "...", "requires_prior_concepts": false, "reasoning": "..."}]}
+"""
+
 
 class SDLabeler:
     """Автоматическая SD-разметка блоков через LLM."""
@@ -65,8 +77,20 @@ class SDLabeler:
         self.max_tokens = max_tokens
         self.max_chars = max_chars
 
-    def label_block(self, block_content: str, block_id: str = "") -> Dict[str, Any]:
-        """Разметить один блок по уровню СД."""
+    def label_block(
+        self,
+        block_content: str,
+        block_id: str = "",
+        raise_on_error: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Разметить один блок по уровню СД.
+
+        Args:
+            block_content: текст блока
+            block_id: id блока (для логов)
+            raise_on_error: пробросить ошибку LLM вместо разметки по умолчанию
+        """
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -86,11 +110,59 @@ class SDLabeler:
             return result
         except json.JSONDecodeError as exc:
             logger.warning(f"[SD_LABELER] JSON parse error for block {block_id}: {exc}")
+            if raise_on_error:
+                raise
             return self._default_label()
         except Exception as exc:
             logger.error(f"[SD_LABELER] error for block {block_id}: {exc}")
+            if raise_on_error:
+                raise
             return self._default_label()
 
+    def label_blocks_bulk(self, blocks: Sequence[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Разметить несколько блоков одним запросом к LLM (общий системный промпт).
+
+        Args:
+            blocks: последовательность (block_id, block_content)
+        Returns:
+            block_id -> sd_data; блоки, которых нет в ответе, с неизвестным sd_level
+            (или при ошибке запроса) в словарь не попадают — вызывающий код
+            размечает их через label_block()
+        """
+        if not blocks:
+            return {}
+        ids = {block_id for block_id, _ in blocks}
+        user_content = "\n\n".join(
+            f"### Блок id={block_id}\n{(content or '')[: self.max_chars]}" for block_id, content in blocks
+        )
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens * len(blocks),
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": SD_LABELER_SYSTEM_PROMPT + SD_LABELER_BULK_INSTRUCTION},
+                    {"role": "user", "content": user_content},
+                ],
+            )
+            raw = (response.choices[0].message.content or "").strip()
+            items = json.loads(raw).get("results", [])
+        except Exception as exc:
+            logger.warning(f"[SD_LABELER] bulk error for {len(blocks)} blocks: {exc}")
+            return {}
+
+        labeled: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            block_id = str(item.pop("id", ""))
+            if block_id in ids and item.get("sd_level") in SD_LEVELS:
+                labeled[block_id] = item
+        logger.info(f"[SD_LABELER] bulk: {len(labeled)}/{len(blocks)} blocks labeled")
+        return labeled
+
     def label_blocks_batch(self, blocks: List[Dict[str, Any]], author_id: str = "") -> List[Dict[str, Any]]:
         """
         Разметить список блоков. Добавляет поле sd_metadata к каждому блоку.
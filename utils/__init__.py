@@ -6,7 +6,7 @@ Utils package for video registry and metadata management
 
 from .video_registry import VideoRegistry, VideoMetadata, ProcessingRecord
 from .youtube_metadata_fetcher import YouTubeAPIMetadataFetcher
-from .file_utils import create_safe_filename, create_filename, get_date_paths
+from .file_utils import create_safe_filename, create_filename, get_date_paths, ensure_dir
 
 __all__ = [
     'VideoRegistry',
@@ -16,5 +16,6 @@ __all__ = [
     'create_safe_filename',
     'create_filename',
     'get_date_paths',
+    'ensure_dir',
 ]
 
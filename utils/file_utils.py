@@ -77,14 +77,29 @@ def get_date_paths(base_dir: Path, published_date: str) -> Tuple[Path, str, str]
             date_obj = datetime.fromisoformat(published_date.replace('Z', '+00:00'))
         else:
             date_obj = datetime.fromisoformat(published_date)
-        year = date_obj.strftime('%Y')
-        month = date_obj.strftime('%m')
     except (ValueError, AttributeError):
         # Если не удалось распарсить, используем текущую дату
-        now = datetime.now()
-        year = now.strftime('%Y')
-        month = now.strftime('%m')
+        date_obj = datetime.now()
+    # Поля даты напрямую, без двух вызовов strftime
+    year = f"{date_obj.year:04d}"
+    month = f"{date_obj.month:02d}"
     
     full_path = base_dir / year / month
     return full_path, year, month
 
+
+def ensure_dir(path: Path) -> Path:
+    """
+    Создает директорию (с родителями), если ее нет.
+    
+    Результат не запоминается: директорию могут удалить во время работы
+    процесса, а mkdir для существующей директории — один системный вызов.
+    
+    Args:
+        path: Путь к директории
+    
+    Returns:
+        Тот же путь
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    return path
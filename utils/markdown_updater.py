@@ -7,7 +7,7 @@
 
 import re
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
 from .video_registry import VideoRegistry
@@ -16,16 +16,22 @@ from .video_registry import VideoRegistry
 class MarkdownUpdater:
     """Класс для обновления Markdown файла со статусами обработки"""
     
-    def __init__(self, markdown_path: str, registry_path: str = "data/video_registry.json"):
+    def __init__(
+        self,
+        markdown_path: str,
+        registry_path: str = "data/video_registry.json",
+        registry: Optional[VideoRegistry] = None
+    ):
         """
         Инициализация обновлятеля Markdown.
         
         Args:
             markdown_path: Путь к Markdown файлу со списком видео
             registry_path: Путь к файлу реестра видео
+            registry: Уже открытый реестр (видит изменения, еще не сброшенные на диск)
         """
         self.markdown_path = Path(markdown_path)
-        self.registry = VideoRegistry(registry_path)
+        self.registry = registry if registry is not None else VideoRegistry(registry_path)
     
     def update_status_columns(self) -> bool:
         """
@@ -75,6 +81,10 @@ class MarkdownUpdater:
                         '|--------|----------------|--------|'
                     )
             
+            # Один согласованный снимок реестра на всю таблицу: в batch-режиме
+            # потоки пайплайна меняют реестр параллельно с перегенерацией
+            statuses = self.registry.get_status_snapshot()
+            
             # Обновляем строки таблицы
             updated_lines = []
             for i, line in enumerate(lines):
@@ -83,7 +93,7 @@ class MarkdownUpdater:
                     updated_lines.append(line)
                 elif line.strip().startswith('|') and line.count('|') >= 7:
                     # Строка таблицы - обновляем
-                    updated_line = self._update_table_row(line)
+                    updated_line = self._update_table_row(line, statuses)
                     updated_lines.append(updated_line)
                 else:
                     # Обычная строка - оставляем как есть
@@ -101,12 +111,13 @@ class MarkdownUpdater:
             traceback.print_exc()
             return False
     
-    def _update_table_row(self, line: str) -> str:
+    def _update_table_row(self, line: str, statuses: Dict[str, Tuple[str, str]]) -> str:
         """
         Обновление строки таблицы со статусом обработки.
         
         Args:
             line: Строка таблицы
+            statuses: Снимок реестра из VideoRegistry.get_status_snapshot()
         
         Returns:
             Обновленная строка
@@ -141,23 +152,18 @@ class MarkdownUpdater:
         status_symbol = '[ ]'  # Не обработано
         processed_date = ''
         
-        if self.registry.video_exists(video_id):
-            video_data = self.registry.data["videos"].get(video_id, {})
-            video_status = video_data.get("status", "pending")
+        if video_id in statuses:
+            video_status, processed_at = statuses[video_id]
             
             if video_status == "processed":
                 status_symbol = '[x]'  # Обработано
-                # Получаем дату последней обработки
-                history = video_data.get("processing_history", [])
-                if history:
-                    last_record = history[-1]
-                    processed_at = last_record.get("processed_at", "")
-                    if processed_at:
-                        try:
-                            dt = datetime.fromisoformat(processed_at.replace('Z', '+00:00'))
-                            processed_date = dt.strftime('%d.%m.%Y')
-                        except:
-                            processed_date = processed_at[:10] if len(processed_at) >= 10 else ''
+                # Дата последней обработки
+                if processed_at:
+                    try:
+                        dt = datetime.fromisoformat(processed_at.replace('Z', '+00:00'))
+                        processed_date = dt.strftime('%d.%m.%Y')
+                    except:
+                        processed_date = processed_at[:10] if len(processed_at) >= 10 else ''
             elif video_status == "failed":
                 status_symbol = '[!]'  # Ошибка
         
@@ -5,13 +5,17 @@
 Обеспечивает проверку дубликатов, индексацию, историю обработки.
 """
 
-import json
 import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
+import orjson
+
 
 @dataclass
 class VideoMetadata:
@@ -56,13 +60,21 @@ class VideoRegistry:
     def __init__(self, registry_path: str = "data/video_registry.json"):
         self.registry_path = Path(registry_path)
         self.data = self._load()
+        # Реестр разделяется потоками batch-пайплайна: мутации и запись под одной блокировкой
+        self._lock = threading.RLock()
+        # Внутри batch() запись на диск откладывается до flush()/выхода из контекста
+        self._batch_depth = 0
+        self._dirty = False
+        # Агрегаты (счетчики статусов, суммы по истории обработки) поддерживаются
+        # инкрементально методами реестра; None — еще не посчитаны
+        self._aggregates: Optional[dict] = None
     
     def _load(self) -> dict:
         """Загрузка реестра из файла"""
         if self.registry_path.exists():
             try:
-                with open(self.registry_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(self.registry_path, 'rb') as f:
+                    return orjson.loads(f.read())
             except Exception as e:
                 print(f"[WARNING] Ошибка загрузки реестра: {e}. Создаю новый.")
         
@@ -77,30 +89,84 @@ class VideoRegistry:
             "videos": {}
         }
     
+    @contextmanager
+    def batch(self):
+        """
+        Групповое обновление: мутации внутри контекста не пишут файл,
+        реестр сохраняется один раз при выходе (или при явном flush()).
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+    
+    def flush(self):
+        """Запись отложенных изменений на диск (если они есть)"""
+        with self._lock:
+            if self._dirty:
+                self._write()
+    
     def save(self):
-        """Сохранение реестра"""
-        self.data["last_updated"] = datetime.now().isoformat()
-        
-        # Обновляем счетчики
-        self.data["total_videos"] = len(self.data["videos"])
-        self.data["processed"] = sum(
-            1 for v in self.data["videos"].values() 
-            if v["status"] == "processed"
-        )
-        self.data["failed"] = sum(
-            1 for v in self.data["videos"].values() 
-            if v["status"] == "failed"
-        )
-        self.data["pending"] = sum(
-            1 for v in self.data["videos"].values() 
-            if v["status"] == "pending"
-        )
-        
-        # Создаем директорию если нужно
-        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(self.registry_path, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        """Сохранение реестра (внутри batch() — отложенное)"""
+        with self._lock:
+            if self._batch_depth > 0:
+                self._dirty = True
+                return
+            self._write()
+    
+    def _write(self):
+        """Пересчет счетчиков и запись реестра в файл"""
+        with self._lock:
+            self._dirty = False
+            self.data["last_updated"] = datetime.now().isoformat()
+            
+            # Обновляем счетчики
+            statuses = self._get_aggregates()["statuses"]
+            self.data["total_videos"] = len(self.data["videos"])
+            self.data["processed"] = statuses["processed"]
+            self.data["failed"] = statuses["failed"]
+            self.data["pending"] = statuses["pending"]
+            
+            # Создаем директорию если нужно
+            self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            with open(self.registry_path, 'wb') as f:
+                f.write(orjson.dumps(self.data, option=orjson.OPT_INDENT_2))
+    
+    def _get_aggregates(self) -> dict:
+        """Агрегаты реестра (считаются одним проходом при первом обращении, дальше — инкрементально)"""
+        with self._lock:
+            if self._aggregates is None:
+                statuses = Counter()
+                total_blocks = total_entities = 0
+                total_cost = 0.0
+                for video in self.data["videos"].values():
+                    statuses[video["status"]] += 1
+                    for record in video.get("processing_history", []):
+                        total_blocks += record.get("blocks_created", 0)
+                        total_entities += record.get("entities_extracted", 0)
+                        total_cost += record.get("api_cost_estimate", 0)
+                self._aggregates = {
+                    "statuses": statuses,
+                    "total_blocks": total_blocks,
+                    "total_entities": total_entities,
+                    "total_cost": total_cost,
+                }
+            return self._aggregates
+    
+    def _set_status(self, video_id: str, status: str):
+        """Смена статуса видео с обновлением счетчиков"""
+        video = self.data["videos"][video_id]
+        if self._aggregates is not None:
+            statuses = self._aggregates["statuses"]
+            statuses[video["status"]] -= 1
+            statuses[status] += 1
+        video["status"] = status
     
     def video_exists(self, video_id: str) -> bool:
         """Проверка: существует ли видео в реестре"""
@@ -122,64 +188,97 @@ class VideoRegistry:
         Returns:
             bool: True если добавлено, False если уже существует
         """
-        if self.video_exists(metadata.video_id):
-            print(f"⚠️ Видео {metadata.video_id} уже в реестре")
-            return False
-        
-        self.data["videos"][metadata.video_id] = {
-            **asdict(metadata),
-            "processing_history": [],
-            "files": {},
-            "metadata": {
-                "language": metadata.language,
-                "has_subtitles": metadata.has_subtitles,
-                "subtitle_type": metadata.subtitle_type,
-                "description": metadata.description,
-                "tags": metadata.tags
+        with self._lock:
+            if self.video_exists(metadata.video_id):
+                print(f"⚠️ Видео {metadata.video_id} уже в реестре")
+                return False
+            
+            self.data["videos"][metadata.video_id] = {
+                **asdict(metadata),
+                "processing_history": [],
+                "files": {},
+                "metadata": {
+                    "language": metadata.language,
+                    "has_subtitles": metadata.has_subtitles,
+                    "subtitle_type": metadata.subtitle_type,
+                    "description": metadata.description,
+                    "tags": metadata.tags
+                }
             }
-        }
-        
-        self.save()
+            if self._aggregates is not None:
+                self._aggregates["statuses"][metadata.status] += 1
+            
+            self.save()
         print(f"✅ Видео {metadata.video_id} добавлено в реестр")
         return True
     
     def update_status(self, video_id: str, status: str):
         """Обновление статуса видео"""
-        if not self.video_exists(video_id):
-            raise ValueError(f"Видео {video_id} не найдено в реестре")
-        
-        self.data["videos"][video_id]["status"] = status
-        self.save()
+        with self._lock:
+            if not self.video_exists(video_id):
+                raise ValueError(f"Видео {video_id} не найдено в реестре")
+            
+            self._set_status(video_id, status)
+            self.save()
     
     def add_processing_record(self, video_id: str, record: ProcessingRecord):
         """Добавление записи об обработке"""
-        if not self.video_exists(video_id):
-            raise ValueError(f"Видео {video_id} не найдено в реестре")
-        
-        self.data["videos"][video_id]["processing_history"].append(
-            asdict(record)
-        )
-        
-        # Обновляем статус
-        if record.error_message:
-            self.data["videos"][video_id]["status"] = "failed"
-        else:
-            self.data["videos"][video_id]["status"] = "processed"
-        
-        self.save()
+        with self._lock:
+            if not self.video_exists(video_id):
+                raise ValueError(f"Видео {video_id} не найдено в реестре")
+            
+            self.data["videos"][video_id]["processing_history"].append(
+                asdict(record)
+            )
+            if self._aggregates is not None:
+                self._aggregates["total_blocks"] += record.blocks_created
+                self._aggregates["total_entities"] += record.entities_extracted
+                self._aggregates["total_cost"] += record.api_cost_estimate
+            
+            # Обновляем статус
+            self._set_status(video_id, "failed" if record.error_message else "processed")
+            
+            self.save()
     
     def set_file_path(self, video_id: str, file_type: str, path: str):
         """Сохранение пути к файлу"""
-        if not self.video_exists(video_id):
-            raise ValueError(f"Видео {video_id} не найдено в реестре")
-        
-        self.data["videos"][video_id]["files"][file_type] = path
-        self.save()
+        with self._lock:
+            if not self.video_exists(video_id):
+                raise ValueError(f"Видео {video_id} не найдено в реестре")
+            
+            self.data["videos"][video_id]["files"][file_type] = path
+            self.save()
+    
+    def set_file_paths(self, video_id: str, paths: Dict[str, str]):
+        """Сохранение нескольких путей к файлам одной записью реестра"""
+        with self._lock:
+            if not self.video_exists(video_id):
+                raise ValueError(f"Видео {video_id} не найдено в реестре")
+            
+            self.data["videos"][video_id]["files"].update(paths)
+            self.save()
     
     def get_video(self, video_id: str) -> Optional[dict]:
         """Получение информации о видео"""
         return self.data["videos"].get(video_id)
     
+    def get_processed_ids(self) -> frozenset:
+        """Снимок id обработанных видео (для быстрых проверок в цикле)"""
+        with self._lock:
+            return frozenset(
+                video_id for video_id, data in self.data["videos"].items()
+                if data["status"] == "processed"
+            )
+    
+    def get_status_snapshot(self) -> Dict[str, Tuple[str, str]]:
+        """Снимок video_id -> (статус, processed_at последней обработки) под блокировкой"""
+        with self._lock:
+            snapshot = {}
+            for video_id, data in self.data["videos"].items():
+                history = data.get("processing_history") or [{}]
+                snapshot[video_id] = (data["status"], history[-1].get("processed_at", ""))
+            return snapshot
+    
     def get_pending_videos(self) -> List[str]:
         """Получение списка необработанных видео"""
         return [
@@ -196,39 +295,22 @@ class VideoRegistry:
     
     def get_statistics(self) -> dict:
         """Детальная статистика реестра"""
-        videos = list(self.data["videos"].values())
-        
-        if not videos:
-            return {"total": 0}
-        
-        total_blocks = sum(
-            record.get("blocks_created", 0)
-            for video in videos
-            for record in video.get("processing_history", [])
-        )
-        
-        total_entities = sum(
-            record.get("entities_extracted", 0)
-            for video in videos
-            for record in video.get("processing_history", [])
-        )
-        
-        total_cost = sum(
-            record.get("api_cost_estimate", 0)
-            for video in videos
-            for record in video.get("processing_history", [])
-        )
-        
-        processed_count = self.data["processed"]
-        
-        return {
-            "total_videos": self.data["total_videos"],
-            "processed": processed_count,
-            "failed": self.data["failed"],
-            "pending": self.data["pending"],
-            "total_blocks": total_blocks,
-            "total_entities": total_entities,
-            "total_api_cost": round(total_cost, 2),
-            "avg_blocks_per_video": round(total_blocks / processed_count, 1) if processed_count > 0 else 0
-        }
+        with self._lock:
+            if not self.data["videos"]:
+                return {"total": 0}
+            aggregates = self._get_aggregates()
+            statuses = aggregates["statuses"]
+            total_blocks = aggregates["total_blocks"]
+            processed_count = statuses["processed"]
+            
+            return {
+                "total_videos": len(self.data["videos"]),
+                "processed": processed_count,
+                "failed": statuses["failed"],
+                "pending": statuses["pending"],
+                "total_blocks": total_blocks,
+                "total_entities": aggregates["total_entities"],
+                "total_api_cost": round(aggregates["total_cost"], 2),
+                "avg_blocks_per_video": round(total_blocks / processed_count, 1) if processed_count > 0 else 0
+            }
 
@@ -6,7 +6,7 @@
 
 import os
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 try:
@@ -24,6 +24,9 @@ class YouTubeAPIMetadataFetcher:
     Получение полных метаданных через YouTube Data API v3.
     """
     
+    # videos.list принимает не более 50 id за запрос
+    API_BATCH_SIZE = 50
+    
     def __init__(self, api_key: Optional[str] = None):
         """
         Инициализация с API ключом.
@@ -95,7 +98,44 @@ class YouTubeAPIMetadataFetcher:
         if not response.get('items'):
             raise ValueError(f"Видео {video_id} не найдено")
         
-        item = response['items'][0]
+        return self._metadata_from_item(video_id, response['items'][0])
+    
+    def fetch_metadata_batch(self, video_ids: List[str]) -> Dict[str, Dict[str, any]]:
+        """
+        Получение метаданных для многих видео: один запрос videos.list на 50 id.
+        
+        Args:
+            video_ids: Список video_id
+        
+        Returns:
+            Словарь video_id -> метаданные. Видео, которые API не вернул
+            (или если API недоступен), в словарь не попадают — для них
+            вызывающий код использует fetch_metadata().
+        """
+        if not self.youtube or not video_ids:
+            return {}
+        
+        result = {}
+        for start in range(0, len(video_ids), self.API_BATCH_SIZE):
+            chunk = video_ids[start:start + self.API_BATCH_SIZE]
+            try:
+                response = self.youtube.videos().list(
+                    part='snippet,contentDetails',
+                    id=",".join(chunk)
+                ).execute()
+            except Exception as e:
+                print(f"[WARNING] Ошибка пакетного запроса YouTube API ({len(chunk)} видео): {e}")
+                continue
+            
+            for item in response.get('items', []):
+                video_id = item.get('id')
+                if video_id:
+                    result[video_id] = self._metadata_from_item(video_id, item)
+        
+        return result
+    
+    def _metadata_from_item(self, video_id: str, item: Dict[str, any]) -> Dict[str, any]:
+        """Преобразование элемента ответа videos.list в словарь метаданных"""
         snippet = item['snippet']
         content = item['contentDetails']
         
@@ -4,13 +4,16 @@ Provides ChromaDB integration for semantic search across documents, blocks, and
 """
 
 from .chromadb_manager import VectorDBManager
-from .embedding_service import EmbeddingService
+from .embedding_service import EmbeddingService, get_embedding_service
+from .embedding_cache import CachedEmbeddingService
 from .vector_indexer import VectorIndexer
 from .vector_search import VectorSearch
 
 __all__ = [
     'VectorDBManager',
     'EmbeddingService',
+    'get_embedding_service',
+    'CachedEmbeddingService',
     'VectorIndexer',
     'VectorSearch',
 ]
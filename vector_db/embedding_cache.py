@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent embedding cache (SQLite) for EmbeddingService
+"""
+
+import hashlib
+import logging
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddingService:
+    """
+    Обертка над EmbeddingService с постоянным кэшем эмбеддингов.
+
+    Ключ — sha256(model + "|" + text), вектор хранится в SQLite как float32
+    (точность результата модели), поэтому повторная индексация тех же блоков
+    не пересчитывает эмбеддинги и дает те же векторы, что и без кэша.
+    """
+
+    def __init__(self, service: EmbeddingService, cache_path: str = ".cache/embeddings.sqlite"):
+        """
+        Args:
+            service: Исходный сервис эмбеддингов
+            cache_path: Путь к файлу SQLite с кэшем
+        """
+        self.service = service
+        self.model_name = getattr(service, "model_name", "") or ""
+        # Квантованный ONNX-бэкенд дает немного другие векторы — кэшируем их отдельно
+        backend = getattr(service, "backend", "torch")
+        if backend and backend != "torch":
+            self.model_name = f"{self.model_name}@{backend}"
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Одно соединение на процесс; пул batch-режима обращается к нему под блокировкой
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash BLOB PRIMARY KEY, model TEXT, dim INT, vec BLOB)"
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"✅ Кэш эмбеддингов: {self.cache_path}")
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}|{text}".encode("utf-8")).digest()
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return struct.pack(f"<{len(vector)}f", *vector)
+
+    @staticmethod
+    def _unpack(blob: bytes, dim: int) -> List[float]:
+        return list(struct.unpack(f"<{dim}f", blob))
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        # Ограничение SQLite на число параметров в запросе
+        chunk = 500
+        with self._lock:
+            for start in range(0, len(keys), chunk):
+                part = keys[start:start + chunk]
+                rows = self._conn.execute(
+                    f"SELECT hash, dim, vec FROM embeddings WHERE hash IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, dim, blob in rows:
+                    # Записи старого формата (float16) считаются промахом и перезаписываются
+                    if len(blob) == 4 * dim:
+                        found[key] = self._unpack(blob, dim)
+        return found
+
+    def _store(self, items: Dict[bytes, List[float]]) -> None:
+        """Сохраняет векторы в кэш"""
+        rows = [
+            (key, self.model_name, len(vector), self._pack(vector))
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, model, dim, vec) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def create_embedding(self, text: str) -> List[float]:
+        """Эмбеддинг одного текста с учетом кэша"""
+        return self.create_embeddings_batch([text])[0]
+
+    def create_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Эмбеддинги списка текстов: попадания берутся из кэша, промахи
+        считаются одним батч-вызовом исходного сервиса
+        """
+        if not texts:
+            return []
+
+        # Пустые тексты не кэшируются — сервис отдает для них нулевой вектор
+        keys: List[Optional[bytes]] = [
+            self._key(text.strip()) if text and text.strip() else None for text in texts
+        ]
+        cached = self._lookup(list({k for k in keys if k is not None}))
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key is not None and key not in cached and key not in missing:
+                missing[key] = text.strip()
+
+        self.hits += sum(1 for k in keys if k is not None and k in cached)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.service.create_embeddings_batch(list(missing.values()), batch_size=batch_size)
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            # При промахе возвращаем вектор модели как есть
+            cached.update(computed)
+
+        zero = [0.0] * self.service.embedding_dim
+        return [cached[k] if k is not None else list(zero) for k in keys]
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий/промахов кэша за время жизни процесса"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def warmup(self) -> None:
+        self.service.warmup()
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.service.embedding_dim
+
+    @property
+    def dimension(self) -> int:
+        return self.service.embedding_dim
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
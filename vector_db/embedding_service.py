@@ -6,6 +6,7 @@ Embedding Service for creating vector embeddings using Sentence-Transformers
 
 import logging
 import os
+from functools import lru_cache
 from typing import List, Optional
 
 from sentence_transformers import SentenceTransformer
@@ -17,13 +18,16 @@ logger = logging.getLogger(__name__)
 class EmbeddingService:
     """Сервис для создания эмбеддингов через Sentence-Transformers"""
     
-    def __init__(self, model: Optional[str] = None, device: Optional[str] = None):
+    def __init__(self, model: Optional[str] = None, device: Optional[str] = None,
+                 backend: Optional[str] = None):
         """
         Инициализация сервиса эмбеддингов
         
         Args:
             model: Модель Sentence-Transformers (если не указана, берется из SENTENCE_TRANSFORMERS_MODEL в .env, иначе intfloat/multilingual-e5-large)
             device: Устройство для выполнения ('cuda', 'cpu', 'mps' или None для автоматического выбора)
+            backend: 'torch' (по умолчанию) или 'onnx' — ONNX Runtime с квантованной int8 моделью для CPU
+                     (если не указан, берется из SENTENCE_TRANSFORMERS_BACKEND в .env)
         """
         # Загружаем окружение
         load_env()
@@ -36,16 +40,34 @@ class EmbeddingService:
         if device is None:
             device = os.getenv("SENTENCE_TRANSFORMERS_DEVICE", None)  # None = автоматический выбор
         
+        # Бэкенд: сначала из параметра, потом из env, потом PyTorch
+        if backend is None:
+            backend = os.getenv("SENTENCE_TRANSFORMERS_BACKEND", "torch")
+        model_kwargs = {}
+        self.backend = backend
+        if backend == "onnx":
+            # Квантованный AVX2-файл модели; путь внутри репозитория модели на HF Hub
+            onnx_file = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+            model_kwargs = {"backend": "onnx", "model_kwargs": {"file_name": onnx_file}}
+            self.backend = f"onnx:{onnx_file}"
+        
         logger.info(f"⏳ Загрузка модели Sentence-Transformers: {model}")
         if device:
             logger.info(f"   Устройство: {device} (явно указано)")
         else:
             logger.info(f"   Устройство: автоматический выбор (GPU если доступен, иначе CPU)")
+        logger.info(f"   Бэкенд: {backend}")
+        
+        self.model_name = model
         
         try:
-            self.model = SentenceTransformer(model, device=device)
+            self.model = SentenceTransformer(model, device=device, **model_kwargs)
             self.embedding_dim = self.model.get_sentence_embedding_dimension()
-            actual_device = str(next(self.model.parameters()).device)
+            # У ONNX-бэкенда может не быть torch-параметров — тогда устройство берем из настроек
+            try:
+                actual_device = str(next(self.model.parameters()).device)
+            except StopIteration:
+                actual_device = device or "cpu"
             logger.info(f"✅ EmbeddingService инициализирован с моделью: {model}, размерность: {self.embedding_dim}, устройство: {actual_device}")
         except Exception as e:
             logger.error(f"❌ Ошибка при загрузке модели {model}: {e}")
@@ -113,15 +135,10 @@ class EmbeddingService:
                 show_progress_bar=False
             )
             
-            # Восстанавливаем порядок с учетом пустых текстов
-            result = []
-            embedding_idx = 0
-            for i, original_text in enumerate(texts):
-                if i in valid_indices:
-                    result.append(embeddings[embedding_idx].tolist())
-                    embedding_idx += 1
-                else:
-                    result.append([0.0] * self.embedding_dim)  # Пустые тексты получают нулевые векторы
+            # Восстанавливаем порядок с учетом пустых текстов (пустые получают нулевые векторы)
+            result = [[0.0] * self.embedding_dim for _ in texts]
+            for i, embedding in zip(valid_indices, embeddings):
+                result[i] = embedding.tolist()
             
             logger.info(f"✅ Обработано {len(valid_texts)} текстов")
             return result
@@ -130,7 +147,27 @@ class EmbeddingService:
             logger.error(f"Ошибка при создании эмбеддингов батчем: {e}")
             raise RuntimeError(f"Не удалось создать эмбеддинги: {e}") from e
     
+    def warmup(self) -> None:
+        """
+        Прогрев модели: один короткий encode, чтобы первая реальная индексация
+        не платила за инициализацию токенизатора и ядер устройства
+        """
+        try:
+            self.model.encode("warmup", convert_to_numpy=True, show_progress_bar=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Прогрев модели не удался: {e}")
+    
     @property
     def dimension(self) -> int:
         """Возвращает размерность эмбеддингов"""
         return self.embedding_dim
+
+
+@lru_cache(maxsize=4)
+def get_embedding_service(model: Optional[str] = None, device: Optional[str] = None,
+                          backend: Optional[str] = None) -> EmbeddingService:
+    """
+    EmbeddingService, общий для процесса: модель с теми же параметрами
+    загружается с диска один раз и переиспользуется последующими вызовами
+    """
+    return EmbeddingService(model=model, device=device, backend=backend)
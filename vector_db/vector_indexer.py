@@ -4,17 +4,23 @@
 Vector Indexer for indexing SAG v2.0 data into ChromaDB
 """
 
-import json
 import logging
 import time
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+
+import orjson
 
 from .chromadb_manager import VectorDBManager
 from .embedding_service import EmbeddingService
 
 logger = logging.getLogger(__name__)
 
+# Подготовленные к индексации данные одного уровня: (ids, тексты, метаданные)
+Prepared = Tuple[List[str], List[str], List[Dict[str, Any]]]
+# Уровень, готовый к записи: подготовленные данные и их эмбеддинги
+Embedded = Tuple[Prepared, List[List[float]]]
+
 
 class VectorIndexer:
     """Индексатор для добавления SAG v2.0 данных в векторную базу"""
@@ -23,7 +29,8 @@ class VectorIndexer:
         self, 
         db_manager: VectorDBManager,
         embedding_service: EmbeddingService,
-        batch_size: int = 100
+        batch_size: int = 100,
+        embedding_batch_size: int = 64
     ):
         """
         Инициализация индексатора
@@ -32,10 +39,12 @@ class VectorIndexer:
             db_manager: Менеджер ChromaDB
             embedding_service: Сервис для создания эмбеддингов
             batch_size: Размер батча для обработки
+            embedding_batch_size: Размер батча модели эмбеддингов
         """
         self.db_manager = db_manager
         self.embedding_service = embedding_service
         self.batch_size = batch_size
+        self.embedding_batch_size = embedding_batch_size
         
         logger.info("✅ VectorIndexer инициализирован")
     
@@ -50,54 +59,50 @@ class VectorIndexer:
             True если успешно
         """
         try:
-            collection = self.db_manager.get_or_create_collection("documents")
-            
-            # Подготовка текста для векторизации
-            document_title = sag_data.get("document_title", "")
-            document_summary = sag_data.get("document_summary", "")
-            text_to_embed = f"{document_title}\n{document_summary}".strip()
-            
-            if not text_to_embed:
-                logger.warning("Пустой документ, пропускаем индексацию")
+            prepared = self._prepare_document(sag_data)
+            if prepared is None:
                 return False
             
-            # Создание эмбеддинга
-            embedding = self.embedding_service.create_embedding(text_to_embed)
-            
-            # Подготовка метаданных
-            metadata = sag_data.get("document_metadata", {})
-            doc_metadata = {
-                "video_id": metadata.get("video_id", ""),
-                "document_title": document_title,
-                "published_date": metadata.get("published_date", ""),
-                "source_url": metadata.get("source_url", ""),
-                "language": metadata.get("language", "ru"),
-                "domain": metadata.get("domain", ""),
-                "collection_target": metadata.get("collection_target", ""),
-                "main_topics": ", ".join(metadata.get("main_topics", [])),
-                "difficulty_level": metadata.get("difficulty_level", ""),
-                "total_blocks": str(metadata.get("total_blocks", 0)),
-                "schema_version": metadata.get("schema_version", "2.0"),
-            }
-            
-            # ID документа
-            doc_id = f"doc_{metadata.get('video_id', 'unknown')}"
-            
-            # Добавление в коллекцию
-            collection.add(
-                ids=[doc_id],
-                embeddings=[embedding],
-                documents=[text_to_embed],
-                metadatas=[doc_metadata]
-            )
-            
-            logger.info(f"✅ Документ проиндексирован: {doc_id}")
-            return True
+            indexed = self._embed_and_add("documents", prepared)
+            logger.info(f"✅ Документ проиндексирован: {prepared[0][0]}")
+            return indexed > 0
             
         except Exception as e:
             logger.error(f"Ошибка при индексации документа: {e}", exc_info=True)
             return False
     
+    def _prepare_document(self, sag_data: Dict[str, Any]) -> Optional[Prepared]:
+        """Готовит id, текст и метаданные документа (без векторизации)"""
+        # Подготовка текста для векторизации
+        document_title = sag_data.get("document_title", "")
+        document_summary = sag_data.get("document_summary", "")
+        text_to_embed = f"{document_title}\n{document_summary}".strip()
+        
+        if not text_to_embed:
+            logger.warning("Пустой документ, пропускаем индексацию")
+            return None
+        
+        # Подготовка метаданных
+        metadata = sag_data.get("document_metadata", {})
+        doc_metadata = {
+            "video_id": metadata.get("video_id", ""),
+            "document_title": document_title,
+            "published_date": metadata.get("published_date", ""),
+            "source_url": metadata.get("source_url", ""),
+            "language": metadata.get("language", "ru"),
+            "domain": metadata.get("domain", ""),
+            "collection_target": metadata.get("collection_target", ""),
+            "main_topics": ", ".join(metadata.get("main_topics", [])),
+            "difficulty_level": metadata.get("difficulty_level", ""),
+            "total_blocks": str(metadata.get("total_blocks", 0)),
+            "schema_version": metadata.get("schema_version", "2.0"),
+        }
+        
+        # ID документа
+        doc_id = f"doc_{metadata.get('video_id', 'unknown')}"
+        
+        return [doc_id], [text_to_embed], [doc_metadata]
+    
     def index_blocks(self, sag_data: Dict[str, Any]) -> int:
         """
         Индексирует все блоки документа
@@ -109,108 +114,97 @@ class VectorIndexer:
             Количество проиндексированных блоков
         """
         try:
-            collection = self.db_manager.get_or_create_collection("blocks")
-            blocks = sag_data.get("blocks", [])
-            
-            if not blocks:
-                logger.warning("Нет блоков для индексации")
+            prepared = self._prepare_blocks(sag_data)
+            if prepared is None:
                 return 0
             
-            video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
-            document_title = sag_data.get("document_title", "")
-            
-            # Подготовка данных для батч-обработки
-            texts_to_embed = []
-            block_ids = []
-            metadatas_list = []
+            indexed_count = self._embed_and_add("blocks", prepared)
+            logger.info(f"✅ Проиндексировано блоков: {indexed_count}/{len(sag_data.get('blocks', []))}")
+            return indexed_count
             
-            for block in blocks:
-                # Подготовка текста для векторизации
-                block_title = block.get("title", "")
-                block_summary = block.get("summary", "")
-                block_content = block.get("content", "")
-                keywords = ", ".join(block.get("keywords", []))
-                
-                text_to_embed = f"{block_title}\n{block_summary}\n{keywords}\n{block_content}".strip()
-                
-                if not text_to_embed:
-                    continue
-                
-                texts_to_embed.append(text_to_embed)
-                block_id = block.get("block_id", f"{video_id}_unknown")
-                block_ids.append(block_id)
-                
-                # Подготовка метаданных
-                safety = block.get("safety", {})
-                has_safety_warnings = bool(
-                    safety.get("contraindications") or 
-                    safety.get("when_to_stop") or
-                    safety.get("when_to_seek_professional_help")
-                )
-                
-                metadata = {
-                    "block_id": block_id,
-                    "video_id": video_id,
-                    "document_title": document_title,
-                    "published_date": sag_data.get("document_metadata", {}).get("published_date", ""),
-                    "start": block.get("start", ""),
-                    "end": block.get("end", ""),
-                    "block_type": block.get("block_type", ""),
-                    "emotional_tone": block.get("sd_metadata", {}).get(
-                        "emotional_tone",
-                        block.get("emotional_tone", ""),
-                    ),
-                    "block_emotional_tone": block.get("emotional_tone", ""),
-                    "conceptual_depth": block.get("conceptual_depth", ""),
-                    "complexity_score": str(block.get("complexity_score", 0.0)),
-                    "collection_target": sag_data.get("document_metadata", {}).get("collection_target", ""),
-                    "youtube_link": block.get("youtube_link", ""),
-                    "graph_entities": ", ".join(block.get("graph_entities", [])[:10]),  # Первые 10 для метаданных
-                    # Новые флаги для экстракторов SAG v2.0
-                    "has_safety_warnings": str(has_safety_warnings),
-                    "has_causal_chains": str(bool(block.get("causal_chains"))),
-                    "has_case_studies": str(bool(block.get("case_studies"))),
-                    "has_prerequisites": str(bool(block.get("prerequisites", {}).get("prerequisites"))),
-                    "has_concept_hierarchy": str(bool(block.get("concept_hierarchy"))),
-                    # SD-метаданные (fallback GREEN для безопасной деградации)
-                    "sd_level": block.get("sd_metadata", {}).get("sd_level", "GREEN"),
-                    "sd_secondary": block.get("sd_metadata", {}).get("sd_secondary") or "",
-                    "requires_prior_concepts": str(
-                        bool(block.get("sd_metadata", {}).get("requires_prior_concepts", False))
-                    ),
-                    "author_id": block.get("sd_metadata", {}).get("author_id", "unknown"),
-                }
-                metadatas_list.append(metadata)
+        except Exception as e:
+            logger.error(f"Ошибка при индексации блоков: {e}", exc_info=True)
+            return 0
+    
+    def _prepare_blocks(self, sag_data: Dict[str, Any]) -> Optional[Prepared]:
+        """Готовит id, тексты и метаданные блоков (без векторизации)"""
+        blocks = sag_data.get("blocks", [])
+        
+        if not blocks:
+            logger.warning("Нет блоков для индексации")
+            return None
+        
+        video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
+        document_title = sag_data.get("document_title", "")
+        
+        # Подготовка данных для батч-обработки
+        texts_to_embed = []
+        block_ids = []
+        metadatas_list = []
+        
+        for block in blocks:
+            # Подготовка текста для векторизации
+            block_title = block.get("title", "")
+            block_summary = block.get("summary", "")
+            block_content = block.get("content", "")
+            keywords = ", ".join(block.get("keywords", []))
             
-            if not texts_to_embed:
-                logger.warning("Нет валидных блоков для индексации")
-                return 0
+            text_to_embed = f"{block_title}\n{block_summary}\n{keywords}\n{block_content}".strip()
             
-            # Батч-создание эмбеддингов
-            embeddings = self.embedding_service.create_embeddings_batch(texts_to_embed)
+            if not text_to_embed:
+                continue
             
-            # Добавление в коллекцию батчами
-            indexed_count = 0
-            for i in range(0, len(block_ids), self.batch_size):
-                batch_ids = block_ids[i:i + self.batch_size]
-                batch_embeddings = embeddings[i:i + self.batch_size]
-                batch_documents = texts_to_embed[i:i + self.batch_size]
-                batch_metadatas = metadatas_list[i:i + self.batch_size]
-                
-                collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_documents,
-                    metadatas=batch_metadatas
-                )
-                indexed_count += len(batch_ids)
+            texts_to_embed.append(text_to_embed)
+            block_id = block.get("block_id", f"{video_id}_unknown")
+            block_ids.append(block_id)
             
-            logger.info(f"✅ Проиндексировано блоков: {indexed_count}/{len(blocks)}")
-            return indexed_count
+            # Подготовка метаданных
+            safety = block.get("safety", {})
+            has_safety_warnings = bool(
+                safety.get("contraindications") or 
+                safety.get("when_to_stop") or
+                safety.get("when_to_seek_professional_help")
+            )
             
-        except Exception as e:
-            logger.error(f"Ошибка при индексации блоков: {e}", exc_info=True)
-            return 0
+            metadata = {
+                "block_id": block_id,
+                "video_id": video_id,
+                "document_title": document_title,
+                "published_date": sag_data.get("document_metadata", {}).get("published_date", ""),
+                "start": block.get("start", ""),
+                "end": block.get("end", ""),
+                "block_type": block.get("block_type", ""),
+                "emotional_tone": block.get("sd_metadata", {}).get(
+                    "emotional_tone",
+                    block.get("emotional_tone", ""),
+                ),
+                "block_emotional_tone": block.get("emotional_tone", ""),
+                "conceptual_depth": block.get("conceptual_depth", ""),
+                "complexity_score": str(block.get("complexity_score", 0.0)),
+                "collection_target": sag_data.get("document_metadata", {}).get("collection_target", ""),
+                "youtube_link": block.get("youtube_link", ""),
+                "graph_entities": ", ".join(block.get("graph_entities", [])[:10]),  # Первые 10 для метаданных
+                # Новые флаги для экстракторов SAG v2.0
+                "has_safety_warnings": str(has_safety_warnings),
+                "has_causal_chains": str(bool(block.get("causal_chains"))),
+                "has_case_studies": str(bool(block.get("case_studies"))),
+                "has_prerequisites": str(bool(block.get("prerequisites", {}).get("prerequisites"))),
+                "has_concept_hierarchy": str(bool(block.get("concept_hierarchy"))),
+                # SD-метаданные (fallback GREEN для безопасной деградации)
+                "sd_level": block.get("sd_metadata", {}).get("sd_level", "GREEN"),
+                "sd_secondary": block.get("sd_metadata", {}).get("sd_secondary") or "",
+                "requires_prior_concepts": str(
+                    bool(block.get("sd_metadata", {}).get("requires_prior_concepts", False))
+                ),
+                "author_id": block.get("sd_metadata", {}).get("author_id", "unknown"),
+            }
+            metadatas_list.append(metadata)
+        
+        if not texts_to_embed:
+            logger.warning("Нет валидных блоков для индексации")
+            return None
+        
+        return block_ids, texts_to_embed, metadatas_list
     
     def index_graph_entities(self, sag_data: Dict[str, Any]) -> int:
         """
@@ -223,80 +217,11 @@ class VectorIndexer:
             Количество проиндексированных сущностей
         """
         try:
-            collection = self.db_manager.get_or_create_collection("graph_entities")
-            blocks = sag_data.get("blocks", [])
-            
-            if not blocks:
-                logger.warning("Нет блоков для извлечения граф-сущностей")
-                return 0
-            
-            video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
-            document_title = sag_data.get("document_title", "")
-            
-            # Собираем все уникальные граф-сущности с контекстом
-            entity_contexts: Dict[str, List[str]] = {}
-            
-            for block in blocks:
-                graph_entities = block.get("graph_entities", [])
-                block_title = block.get("title", "")
-                block_summary = block.get("summary", "")
-                block_id = block.get("block_id", "")
-                
-                for entity in graph_entities:
-                    if entity not in entity_contexts:
-                        entity_contexts[entity] = []
-                    # Добавляем контекст блока
-                    context = f"Блок: {block_title}\n{block_summary}"
-                    entity_contexts[entity].append(context)
-            
-            if not entity_contexts:
-                logger.warning("Нет граф-сущностей для индексации")
+            prepared = self._prepare_graph_entities(sag_data)
+            if prepared is None:
                 return 0
             
-            # Подготовка данных для индексации
-            texts_to_embed = []
-            entity_ids = []
-            metadatas_list = []
-            
-            for entity, contexts in entity_contexts.items():
-                # Объединяем контексты
-                context_text = "\n\n".join(contexts[:5])  # Максимум 5 контекстов
-                text_to_embed = f"Граф-сущность: {entity}\n\nКонтекст:\n{context_text}".strip()
-                
-                texts_to_embed.append(text_to_embed)
-                entity_id = f"entity_{video_id}_{entity}"
-                entity_ids.append(entity_id)
-                
-                # Метаданные
-                metadata = {
-                    "entity_name": entity,
-                    "video_id": video_id,
-                    "document_title": document_title,
-                    "published_date": sag_data.get("document_metadata", {}).get("published_date", ""),
-                    "frequency": str(len(contexts)),
-                    "domain": sag_data.get("document_metadata", {}).get("domain", ""),
-                }
-                metadatas_list.append(metadata)
-            
-            # Батч-создание эмбеддингов
-            embeddings = self.embedding_service.create_embeddings_batch(texts_to_embed)
-            
-            # Добавление в коллекцию
-            indexed_count = 0
-            for i in range(0, len(entity_ids), self.batch_size):
-                batch_ids = entity_ids[i:i + self.batch_size]
-                batch_embeddings = embeddings[i:i + self.batch_size]
-                batch_documents = texts_to_embed[i:i + self.batch_size]
-                batch_metadatas = metadatas_list[i:i + self.batch_size]
-                
-                collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_documents,
-                    metadatas=batch_metadatas
-                )
-                indexed_count += len(batch_ids)
-            
+            indexed_count = self._embed_and_add("graph_entities", prepared)
             logger.info(f"✅ Проиндексировано граф-сущностей: {indexed_count}")
             return indexed_count
             
@@ -304,6 +229,64 @@ class VectorIndexer:
             logger.error(f"Ошибка при индексации граф-сущностей: {e}", exc_info=True)
             return 0
     
+    def _prepare_graph_entities(self, sag_data: Dict[str, Any]) -> Optional[Prepared]:
+        """Готовит id, тексты и метаданные граф-сущностей (без векторизации)"""
+        blocks = sag_data.get("blocks", [])
+        
+        if not blocks:
+            logger.warning("Нет блоков для извлечения граф-сущностей")
+            return None
+        
+        video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
+        document_title = sag_data.get("document_title", "")
+        
+        # Собираем все уникальные граф-сущности с контекстом
+        entity_contexts: Dict[str, List[str]] = {}
+        
+        for block in blocks:
+            graph_entities = block.get("graph_entities", [])
+            block_title = block.get("title", "")
+            block_summary = block.get("summary", "")
+            block_id = block.get("block_id", "")
+            
+            for entity in graph_entities:
+                if entity not in entity_contexts:
+                    entity_contexts[entity] = []
+                # Добавляем контекст блока
+                context = f"Блок: {block_title}\n{block_summary}"
+                entity_contexts[entity].append(context)
+        
+        if not entity_contexts:
+            logger.warning("Нет граф-сущностей для индексации")
+            return None
+        
+        # Подготовка данных для индексации
+        texts_to_embed = []
+        entity_ids = []
+        metadatas_list = []
+        
+        for entity, contexts in entity_contexts.items():
+            # Объединяем контексты
+            context_text = "\n\n".join(contexts[:5])  # Максимум 5 контекстов
+            text_to_embed = f"Граф-сущность: {entity}\n\nКонтекст:\n{context_text}".strip()
+            
+            texts_to_embed.append(text_to_embed)
+            entity_id = f"entity_{video_id}_{entity}"
+            entity_ids.append(entity_id)
+            
+            # Метаданные
+            metadata = {
+                "entity_name": entity,
+                "video_id": video_id,
+                "document_title": document_title,
+                "published_date": sag_data.get("document_metadata", {}).get("published_date", ""),
+                "frequency": str(len(contexts)),
+                "domain": sag_data.get("document_metadata", {}).get("domain", ""),
+            }
+            metadatas_list.append(metadata)
+        
+        return entity_ids, texts_to_embed, metadatas_list
+    
     def index_knowledge_graph(self, sag_data: Dict[str, Any]) -> int:
         """
         🚀 Индексирует Knowledge Graph (узлы и связи) для максимально полной базы знаний
@@ -315,100 +298,12 @@ class VectorIndexer:
             Количество проиндексированных узлов графа
         """
         try:
-            knowledge_graph = sag_data.get("knowledge_graph")
-            if not knowledge_graph:
-                logger.warning("Knowledge Graph отсутствует в данных")
-                return 0
-            
-            collection = self.db_manager.get_or_create_collection("knowledge_graph")
-            
-            nodes = knowledge_graph.get("nodes", [])
-            edges = knowledge_graph.get("edges", [])
-            video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
-            
-            logger.info(f"📊 Начало индексации Knowledge Graph: {video_id}")
-            logger.info(f"   Узлов: {len(nodes)}, Рёбер: {len(edges)}")
-            
-            if not nodes:
-                logger.warning("Нет узлов в Knowledge Graph для индексации")
+            prepared = self._prepare_knowledge_graph(sag_data)
+            if prepared is None:
                 return 0
             
-            # Создаем индекс связей для быстрого поиска
-            edges_by_node = {}
-            for edge in edges:
-                from_id = edge.get("from_id")
-                to_id = edge.get("to_id")
-                if from_id not in edges_by_node:
-                    edges_by_node[from_id] = []
-                edges_by_node[from_id].append(edge)
-            
-            # Подготовка данных для индексации узлов
-            texts_to_embed = []
-            node_ids = []
-            metadatas_list = []
-            
-            for node in nodes:
-                node_id = node.get("id", "")
-                node_name = node.get("name", "")
-                node_type = node.get("node_type", "CONCEPT")
-                description = node.get("description", "")
-                
-                # Собираем информацию о связях
-                outgoing_edges = edges_by_node.get(node_id, [])
-                connections_info = []
-                for edge in outgoing_edges[:5]:  # Максимум 5 связей в контексте
-                    target_node = next((n for n in nodes if n.get("id") == edge.get("to_id")), None)
-                    if target_node:
-                        connections_info.append(
-                            f"{edge.get('edge_type', 'RELATED_TO')}: {target_node.get('name', '')}"
-                        )
-                
-                # Формируем текст для эмбеддинга
-                connections_text = "\n".join(connections_info) if connections_info else "Нет связей"
-                text_to_embed = (
-                    f"Узел Knowledge Graph: {node_name}\n"
-                    f"Тип: {node_type}\n"
-                    f"Описание: {description}\n"
-                    f"Связи:\n{connections_text}"
-                ).strip()
-                
-                texts_to_embed.append(text_to_embed)
-                full_node_id = f"kg_node_{video_id}_{node_id}"
-                node_ids.append(full_node_id)
-                
-                # Метаданные узла
-                metadata = {
-                    "node_id": node_id,
-                    "node_name": node_name,
-                    "node_type": node_type,
-                    "video_id": video_id,
-                    "document_title": sag_data.get("document_title", ""),
-                    "description": description[:200] if description else "",  # Ограничение длины
-                    "connections_count": str(len(outgoing_edges)),
-                    "source": ",".join(node.get("metadata", {}).get("source", []) if isinstance(node.get("metadata", {}).get("source"), list) else [node.get("metadata", {}).get("source", "")])
-                }
-                metadatas_list.append(metadata)
-            
-            # Батч-создание эмбеддингов
-            embeddings = self.embedding_service.create_embeddings_batch(texts_to_embed)
-            
-            # Добавление в коллекцию
-            indexed_count = 0
-            for i in range(0, len(node_ids), self.batch_size):
-                batch_ids = node_ids[i:i + self.batch_size]
-                batch_embeddings = embeddings[i:i + self.batch_size]
-                batch_documents = texts_to_embed[i:i + self.batch_size]
-                batch_metadatas = metadatas_list[i:i + self.batch_size]
-                
-                collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_documents,
-                    metadatas=batch_metadatas
-                )
-                indexed_count += len(batch_ids)
-            
-            logger.info(f"✅ Knowledge Graph проиндексирован: {indexed_count} узлов, {len(edges)} рёбер")
+            indexed_count = self._embed_and_add("knowledge_graph", prepared)
+            logger.info(f"✅ Knowledge Graph проиндексирован: {indexed_count} узлов")
             return indexed_count
             
         except Exception as e:
@@ -416,6 +311,106 @@ class VectorIndexer:
             logger.exception(e)  # Полный traceback
             return 0
     
+    def _prepare_knowledge_graph(self, sag_data: Dict[str, Any]) -> Optional[Prepared]:
+        """Готовит id, тексты и метаданные узлов Knowledge Graph (без векторизации)"""
+        knowledge_graph = sag_data.get("knowledge_graph")
+        if not knowledge_graph:
+            logger.warning("Knowledge Graph отсутствует в данных")
+            return None
+        
+        nodes = knowledge_graph.get("nodes", [])
+        edges = knowledge_graph.get("edges", [])
+        video_id = sag_data.get("document_metadata", {}).get("video_id", "unknown")
+        
+        logger.info(f"📊 Начало индексации Knowledge Graph: {video_id}")
+        logger.info(f"   Узлов: {len(nodes)}, Рёбер: {len(edges)}")
+        
+        if not nodes:
+            logger.warning("Нет узлов в Knowledge Graph для индексации")
+            return None
+        
+        # Создаем индекс связей для быстрого поиска
+        edges_by_node = {}
+        for edge in edges:
+            from_id = edge.get("from_id")
+            to_id = edge.get("to_id")
+            if from_id not in edges_by_node:
+                edges_by_node[from_id] = []
+            edges_by_node[from_id].append(edge)
+        
+        # Подготовка данных для индексации узлов
+        texts_to_embed = []
+        node_ids = []
+        metadatas_list = []
+        
+        for node in nodes:
+            node_id = node.get("id", "")
+            node_name = node.get("name", "")
+            node_type = node.get("node_type", "CONCEPT")
+            description = node.get("description", "")
+            
+            # Собираем информацию о связях
+            outgoing_edges = edges_by_node.get(node_id, [])
+            connections_info = []
+            for edge in outgoing_edges[:5]:  # Максимум 5 связей в контексте
+                target_node = next((n for n in nodes if n.get("id") == edge.get("to_id")), None)
+                if target_node:
+                    connections_info.append(
+                        f"{edge.get('edge_type', 'RELATED_TO')}: {target_node.get('name', '')}"
+                    )
+            
+            # Формируем текст для эмбеддинга
+            connections_text = "\n".join(connections_info) if connections_info else "Нет связей"
+            text_to_embed = (
+                f"Узел Knowledge Graph: {node_name}\n"
+                f"Тип: {node_type}\n"
+                f"Описание: {description}\n"
+                f"Связи:\n{connections_text}"
+            ).strip()
+            
+            texts_to_embed.append(text_to_embed)
+            full_node_id = f"kg_node_{video_id}_{node_id}"
+            node_ids.append(full_node_id)
+            
+            # Метаданные узла
+            metadata = {
+                "node_id": node_id,
+                "node_name": node_name,
+                "node_type": node_type,
+                "video_id": video_id,
+                "document_title": sag_data.get("document_title", ""),
+                "description": description[:200] if description else "",  # Ограничение длины
+                "connections_count": str(len(outgoing_edges)),
+                "source": ",".join(node.get("metadata", {}).get("source", []) if isinstance(node.get("metadata", {}).get("source"), list) else [node.get("metadata", {}).get("source", "")])
+            }
+            metadatas_list.append(metadata)
+        
+        return node_ids, texts_to_embed, metadatas_list
+    
+    def _embed_and_add(self, level: str, prepared: Prepared) -> int:
+        """Векторизует подготовленные данные одного уровня и добавляет их в коллекцию"""
+        embeddings = self.embedding_service.create_embeddings_batch(
+            prepared[1], batch_size=self.embedding_batch_size
+        )
+        return self._add_prepared(level, prepared, embeddings)
+    
+    def _add_prepared(self, level: str, prepared: Prepared, embeddings: List[List[float]]) -> int:
+        """Добавляет подготовленные данные с готовыми эмбеддингами в коллекцию батчами"""
+        collection = self.db_manager.get_or_create_collection(level)
+        ids, texts, metadatas = prepared
+        
+        indexed_count = 0
+        for i in range(0, len(ids), self.batch_size):
+            batch_ids = ids[i:i + self.batch_size]
+            collection.add(
+                ids=batch_ids,
+                embeddings=embeddings[i:i + self.batch_size],
+                documents=texts[i:i + self.batch_size],
+                metadatas=metadatas[i:i + self.batch_size]
+            )
+            indexed_count += len(batch_ids)
+        return indexed_count
+    
     def index_sag_file(self, json_path: Path, index_levels: List[str] = None) -> Dict[str, Any]:
         """
         Полная индексация SAG v2.0 JSON файла с мониторингом производительности
@@ -425,16 +420,127 @@ class VectorIndexer:
             index_levels: Список уровней для индексации (documents, blocks, graph_entities)
                          Если None, индексирует все уровни
         
+        Returns:
+            Словарь с результатами индексации
+        """
+        try:
+            # Загрузка JSON
+            with open(json_path, 'rb') as f:
+                sag_data = orjson.loads(f.read())
+        except Exception as e:
+            logger.error(f"Ошибка при индексации файла {json_path}: {e}", exc_info=True)
+            return {
+                "file": str(json_path),
+                "success": False,
+                "indexed": {"documents": 0, "blocks": 0, "graph_entities": 0, "knowledge_graph": 0},
+                "error": str(e)
+            }
+        
+        results = self.index_sag_dict(sag_data, index_levels=index_levels, source=json_path.name)
+        results["file"] = str(json_path)
+        return results
+    
+    def embed_sag_dict(
+        self,
+        sag_data: Dict[str, Any],
+        index_levels: List[str] = None
+    ) -> Dict[str, Embedded]:
+        """
+        Подготовка и векторизация уровней SAG v2.0 без записи в ChromaDB
+        (не использует db_manager — можно выполнять в отдельном процессе)
+        
+        Args:
+            sag_data: Данные SAG v2.0
+            index_levels: Список уровней; если None — все уровни
+        
+        Returns:
+            Словарь уровень -> (подготовленные данные, эмбеддинги); если общий
+            вызов модели упал, уровни векторизуются по отдельности, и в словаре
+            остаются только успешно векторизованные
+        """
+        if index_levels is None:
+            index_levels = ["documents", "blocks", "graph_entities", "knowledge_graph"]
+        
+        # Подготовка всех уровней (documents, blocks, graph_entities, knowledge_graph)
+        preparers = {
+            "documents": self._prepare_document,
+            "blocks": self._prepare_blocks,
+            "graph_entities": self._prepare_graph_entities,
+            "knowledge_graph": self._prepare_knowledge_graph,  # 🚀 Knowledge Graph
+        }
+        prepared_levels: Dict[str, Prepared] = {}
+        for level, prepare in preparers.items():
+            if level not in index_levels:
+                continue
+            try:
+                prepared = prepare(sag_data)
+            except Exception as e:
+                logger.error(f"Ошибка при подготовке уровня {level}: {e}", exc_info=True)
+                continue
+            if prepared is not None:
+                prepared_levels[level] = prepared
+        
+        # Все уровни используют одну модель — векторизуем тексты одним батч-вызовом
+        # (сортировку по длине для минимального паддинга выполняет сам encode)
+        all_texts = [text for prepared in prepared_levels.values() for text in prepared[1]]
+        try:
+            all_embeddings = self.embedding_service.create_embeddings_batch(
+                all_texts, batch_size=self.embedding_batch_size
+            ) if all_texts else []
+        except Exception as e:
+            # Ошибка общего вызова не должна стоить всех уровней:
+            # векторизуем каждый уровень отдельно, пропуская только упавшие
+            logger.warning(f"Ошибка общей векторизации, повтор по уровням: {e}")
+            return self._embed_levels_separately(prepared_levels)
+        
+        # Раскладываем векторы обратно по уровням
+        embedded: Dict[str, Embedded] = {}
+        offset = 0
+        for level, prepared in prepared_levels.items():
+            count = len(prepared[0])
+            embedded[level] = (prepared, all_embeddings[offset:offset + count])
+            offset += count
+        return embedded
+    
+    def _embed_levels_separately(self, prepared_levels: Dict[str, Prepared]) -> Dict[str, Embedded]:
+        """Векторизация уровней по одному; уровень с ошибкой в результат не попадает"""
+        embedded: Dict[str, Embedded] = {}
+        for level, prepared in prepared_levels.items():
+            try:
+                embedded[level] = (prepared, self.embedding_service.create_embeddings_batch(
+                    prepared[1], batch_size=self.embedding_batch_size
+                ))
+            except Exception as e:
+                logger.error(f"Ошибка при векторизации уровня {level}: {e}", exc_info=True)
+        return embedded
+    
+    def index_sag_dict(
+        self,
+        sag_data: Dict[str, Any],
+        index_levels: List[str] = None,
+        source: str = "SAG",
+        embedded: Optional[Dict[str, Embedded]] = None
+    ) -> Dict[str, Any]:
+        """
+        Индексация уже разобранных SAG v2.0 данных (без повторного чтения JSON с диска)
+        
+        Args:
+            sag_data: Данные SAG v2.0
+            index_levels: Список уровней для индексации; если None, индексирует все уровни
+            source: Имя источника для логов (обычно имя файла)
+            embedded: Готовый результат embed_sag_dict (например, из рабочего процесса);
+                      если передан, векторизация пропускается и sag_data не используется
+        
         Returns:
             Словарь с результатами индексации
         """
         if index_levels is None:
             index_levels = ["documents", "blocks", "graph_entities", "knowledge_graph"]
         
-        start_time = time.time()  # ⏱️ Начало отсчета
+        start_time = time.perf_counter()  # ⏱️ Начало отсчета
         
         results = {
-            "file": str(json_path),
+            "file": source,
             "success": False,
             "indexed": {
                 "documents": 0,
@@ -445,34 +551,22 @@ class VectorIndexer:
         }
         
         try:
-            # Загрузка JSON
-            with open(json_path, 'r', encoding='utf-8') as f:
-                sag_data = json.load(f)
+            logger.info(f"🚀 Начало индексации: {source}")
             
-            logger.info(f"🚀 Начало индексации: {json_path.name}")
+            if embedded is None:
+                embedded = self.embed_sag_dict(sag_data, index_levels)
             
-            # Индексация на разных уровнях
-            if "documents" in index_levels:
-                if self.index_document(sag_data):
-                    results["indexed"]["documents"] = 1
-            
-            if "blocks" in index_levels:
-                blocks_count = self.index_blocks(sag_data)
-                results["indexed"]["blocks"] = blocks_count
-            
-            if "graph_entities" in index_levels:
-                entities_count = self.index_graph_entities(sag_data)
-                results["indexed"]["graph_entities"] = entities_count
-            
-            # 🚀 НОВОЕ: Индексация Knowledge Graph
-            if "knowledge_graph" in index_levels:
-                kg_nodes_count = self.index_knowledge_graph(sag_data)
-                results["indexed"]["knowledge_graph"] = kg_nodes_count
+            # Запись в коллекции по уровням
+            for level, (prepared, level_embeddings) in embedded.items():
+                try:
+                    results["indexed"][level] = self._add_prepared(level, prepared, level_embeddings)
+                except Exception as e:
+                    logger.error(f"Ошибка при индексации уровня {level}: {e}", exc_info=True)
             
             results["success"] = True
             
             # Подсчет времени и статистики
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
             total_items = sum([
                 results["indexed"]["documents"],
                 results["indexed"]["blocks"],
@@ -480,13 +574,13 @@ class VectorIndexer:
                 results["indexed"]["knowledge_graph"]
             ])
             
-            logger.info(f"✅ Файл проиндексирован: {json_path.name}")
+            logger.info(f"✅ Файл проиндексирован: {source}")
             logger.info(f"⚡ Индексация завершена за {elapsed:.2f}s "
                        f"({total_items} элементов, {total_items/elapsed:.1f} эл/сек)" if total_items > 0 else f"⚡ Индексация завершена за {elapsed:.2f}s")
             
         except Exception as e:
-            elapsed = time.time() - start_time
-            logger.error(f"Ошибка при индексации файла {json_path}: {e}", exc_info=True)
+            elapsed = time.perf_counter() - start_time
+            logger.error(f"Ошибка при индексации файла {source}: {e}", exc_info=True)
             logger.error(f"⏱️ Время до ошибки: {elapsed:.2f}s")
             results["error"] = str(e)
         